@@ -1,33 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-import shutil
-from pathlib import Path
-from decimal import Decimal
-from app.utils.knowledge_base import create_db, VECTOR_DIR
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from io import BytesIO
+import asyncio
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import datetime
+from typing import Literal
+from app.utils.knowledge_base import (
+    chunk_tokens,
+    delete_client_db,
+    load_documents_from_bytes,
+    splitter_chunks,
+    vetorize_chunks,
+)
 from sqlalchemy import select
 
 from app.db.session import get_session
 from app.db.model.client import Client, ClientKey
 from app.db.model.ai_model import Model
 from app.db.model.log import UploadLog
+from app.db.model.outbox import OutboxMessage
 
 from app.services.admin import verify_admin_key
-from app.schemas.client import ClientSchema, ClientUpdateSchema, AddClientModelSchema
+from app.services.mail.outbox import outbox_message_status
+from app.services import metrics
+from app.utils.breaker import breaker_states
+from app.services.catalog import catalog
+from app.services.export import stream_usage_logs
+from app.services.provisioning import (
+    bulk_add_client_models,
+    bulk_create_client_keys,
+    bulk_create_clients,
+)
+from app.services.usage import (
+    client_totals,
+    record_usage,
+    top_usage,
+    usage_series,
+)
+from app.schemas.client import (
+    ClientSchema,
+    ClientUpdateSchema,
+    AddClientModelSchema,
+    BulkClientsSchema,
+    BulkClientKeysSchema,
+    BulkClientModelsSchema,
+)
 from app.schemas.ai_model import ModelSchema
 
 from app.utils.generators import generate_secure_token
 from app.utils.calculators import (
-    count_tokens,
-    calc_billing,
     calculate_total_upload_cost_gemini,
     calculate_total_upload_cost_openai,
 )
 
-from app.core.config import PRICE_PER_1K_TOKENS, PRICE_PER_1M_TOKENS
+from app.core.config import (
+    PRICE_PER_1K_TOKENS,
+    PRICE_PER_1M_TOKENS,
+    VALUE_PER_REQUEST,
+)
 
 admin_router = APIRouter(prefix="/admin", tags=["administration"])
 
@@ -60,6 +91,36 @@ async def add_client(
     return new_client
 
 
+@admin_router.post("/bulk/add_clients", dependencies=[Depends(verify_admin_key)])
+async def bulk_add_clients(
+    data: BulkClientsSchema,
+    session: AsyncSession = Depends(get_session),
+):
+    result = await bulk_create_clients(session, data.clients)
+    await catalog.invalidate(session)
+
+    return result
+
+
+@admin_router.post("/bulk/create_client_keys", dependencies=[Depends(verify_admin_key)])
+async def bulk_create_keys(
+    data: BulkClientKeysSchema,
+    session: AsyncSession = Depends(get_session),
+):
+    return await bulk_create_client_keys(session, data.client_ids)
+
+
+@admin_router.post("/bulk/add_client_models", dependencies=[Depends(verify_admin_key)])
+async def bulk_add_models(
+    data: BulkClientModelsSchema,
+    session: AsyncSession = Depends(get_session),
+):
+    result = await bulk_add_client_models(session, data.links)
+    await catalog.invalidate(session)
+
+    return result
+
+
 @admin_router.put("/update_client", dependencies=[Depends(verify_admin_key)])
 async def update_client(
     client_id: str,
@@ -117,26 +178,16 @@ async def add_client_knowledgebase(
 
     pdf_bytes_list = [await f.read() for f in files]
 
-    if not create_db(client.id, model, pdf_bytes_list):
+    documents = await asyncio.to_thread(load_documents_from_bytes, pdf_bytes_list)
+    chunks = await asyncio.to_thread(splitter_chunks, documents, model)
+    total_tokens = chunk_tokens(chunks)
+
+    if not await asyncio.to_thread(vetorize_chunks, chunks, client.id, model):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Something went wrong",
         )
 
-    total_tokens = 0
-
-    for pdf_bytes in pdf_bytes_list:
-        pdf_stream = BytesIO(pdf_bytes)
-
-        reader = PdfReader(pdf_stream)
-        text = "\n".join([page.extract_text() or "" for page in reader.pages])
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
-        chunks = splitter.split_text(text)
-
-        for chunk in chunks:
-            total_tokens += count_tokens(chunk, model)
-
     cost = Decimal("0")
     if model.startswith("gpt-"):
         cost = Decimal(
@@ -161,6 +212,9 @@ async def add_client_knowledgebase(
         upload_cost=cost,
     )
     session.add(upload_log)
+    await record_usage(
+        session, client.id, model, embedding_tokens=total_tokens, cost=cost
+    )
 
     await session.commit()
 
@@ -212,6 +266,8 @@ async def delete_client(
 
     await session.delete(client)
     await session.commit()
+    await catalog.invalidate(session)
+    await asyncio.to_thread(delete_client_db, client_id)
 
     return {"message": "Client deleted successfully"}
 
@@ -248,6 +304,7 @@ async def create_model(
     )
     session.add(new_model)
     await session.commit()
+    await catalog.invalidate(session)
 
     return {"message": "Model added successfully"}
 
@@ -283,6 +340,7 @@ async def add_client_model(
     client.models.append(model)
     session.add(client)
     await session.commit()
+    await catalog.invalidate(session)
 
     return {"message": "Model linked to client successfully"}
 
@@ -302,6 +360,7 @@ async def delete_model(
 
     await session.delete(model)
     await session.commit()
+    await catalog.invalidate(session)
 
     return {"message": "Model deleted successfully"}
 
@@ -317,15 +376,13 @@ async def delete_client_base(
             status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
         )
 
-    vector_dir = Path(VECTOR_DIR) / str(client_id)
-    if vector_dir.exists():
-        shutil.rmtree(vector_dir)
+    await asyncio.to_thread(delete_client_db, client_id)
 
     return {"message": f"Knowledge base deleted for client {client_id}"}
 
 
 @admin_router.get("/client_stats", dependencies=[Depends(verify_admin_key)])
-async def client_stats(client_id: str, session: AsyncSession = Depends(get_session)):
+async def client_stats(client_id: int, session: AsyncSession = Depends(get_session)):
     client = await session.get(Client, client_id)
 
     if not client:
@@ -333,8 +390,120 @@ async def client_stats(client_id: str, session: AsyncSession = Depends(get_sessi
             status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
         )
 
-    stats = await calc_billing(client_id, session)
+    stats = await client_totals(session, client_id)
+    client_amount = Decimal(str(stats["cost"])) + VALUE_PER_REQUEST * stats["requests"]
+    stats["client_amount"] = client_amount.quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
 
     return {
         "stats": stats,
     }
+
+
+@admin_router.get("/analytics/usage", dependencies=[Depends(verify_admin_key)])
+async def analytics_usage(
+    start: datetime,
+    end: datetime,
+    period: Literal["hour", "day"] = "day",
+    client_id: int | None = None,
+    model: str | None = None,
+    after: datetime | None = None,
+    limit: int = Query(100, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    return await usage_series(
+        session, start, end, period, client_id, model, after, limit
+    )
+
+
+@admin_router.get("/analytics/top", dependencies=[Depends(verify_admin_key)])
+async def analytics_top(
+    start: datetime,
+    end: datetime,
+    by: Literal["client", "model"] = "client",
+    metric: Literal[
+        "requests",
+        "input_tokens",
+        "output_tokens",
+        "total_tokens",
+        "embedding_tokens",
+        "cost",
+    ] = "cost",
+    after_value: float | None = None,
+    after_key: str | None = None,
+    limit: int = Query(10, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    return await top_usage(
+        session, start, end, by, metric, after_value, after_key, limit
+    )
+
+
+@admin_router.get("/export_logs", dependencies=[Depends(verify_admin_key)])
+async def export_logs(
+    client_id: int,
+    kind: Literal["requests", "uploads"] = "requests",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    session: AsyncSession = Depends(get_session),
+):
+    client = await session.get(Client, client_id)
+
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
+        )
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"{kind}_{client_id}.{format}"
+    if gzip:
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        stream_usage_logs(kind, client_id, start, end, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@admin_router.get("/outbox", dependencies=[Depends(verify_admin_key)])
+async def list_outbox(
+    delivery_status: str | None = None,
+    limit: int = 100,
+    session: AsyncSession = Depends(get_session),
+):
+    stmt = select(OutboxMessage).order_by(OutboxMessage.id.desc()).limit(limit)
+    if delivery_status:
+        stmt = stmt.where(OutboxMessage.status == delivery_status)
+
+    result = await session.execute(stmt)
+
+    return [outbox_message_status(message) for message in result.scalars().all()]
+
+
+@admin_router.get("/outbox/{message_id}", dependencies=[Depends(verify_admin_key)])
+async def get_outbox_message(
+    message_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    message = await session.get(OutboxMessage, message_id)
+
+    if not message:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unavailable")
+
+    return outbox_message_status(message)
+
+
+@admin_router.get("/metrics", dependencies=[Depends(verify_admin_key)])
+async def get_metrics():
+    return {
+        **metrics.snapshot(),
+        "no_answer_rate": metrics.ratio("completions.no_answer", "completions.total"),
+        "hedge_rate": metrics.ratio("llm.hedged", "llm.calls"),
+        "hedge_win_rate": metrics.ratio("llm.hedge_wins", "llm.hedged"),
+        "breakers": breaker_states(),
+    }
@@ -1,31 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from decimal import Decimal
+import math
 
-from app.utils.text_response import question
+from app.utils.text_response import empty_usage, question, question_batch
+from app.utils.breaker import CircuitOpen
+from app.utils.deadline import (
+    ClientDisconnected,
+    Deadline,
+    DeadlineExceeded,
+    cancel_on_disconnect,
+)
 
-from app.schemas.client import ChatRequestSchema
+from app.schemas.client import (
+    BatchChatRequestSchema,
+    ChatRequestSchema,
+    ConversationMessageSchema,
+    ConversationSchema,
+    EmbeddingRequestSchema,
+)
 
 from app.db.model.client import Client
-from app.db.model.ai_model import Model
-from app.db.model.log import RequestLog
+from app.db.model.conversation import Conversation, ConversationTurn
+from app.db.model.log import UploadLog
 from app.db.session import get_session
 
-from app.services.client import get_current_client
+from app.services.client import (
+    get_current_client,
+    enforce_rate_limit,
+    request_deadline,
+)
+from app.services import metrics
+from app.services.usage import log_completions, record_usage
+from app.services.shared_state import hit_rate_limit
+from app.services.catalog import CatalogModel, catalog, is_embedding_model
+from app.services.embeddings import batcher, encode_base64
+from app.services.conversation import (
+    add_turn,
+    pending_turns,
+    reply,
+    schedule_summary,
+)
+from app.utils.calculators import count_tokens
 
-from app.core.config import MAX_USER_CHARS
-
-from app.utils.calculators import calculate_openai_cost, calculate_gemini_cost
+from app.core.config import (
+    BATCH_CONCURRENCY,
+    BATCH_MAX_PROMPTS,
+    EMBEDDING_MAX_INPUTS,
+    MAX_USER_CHARS,
+    RATE_LIMIT_PER_MINUTE,
+)
 
 client_router = APIRouter(prefix="/v1", tags=["completions"])
 
 
-@client_router.post("/chat/completions")
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+
+async def log_partial_completions(
+    session: AsyncSession,
+    client_id: int,
+    model: CatalogModel,
+    usages: list[dict],
+    endpoint: str,
+):
+    """Bill what reached the provider before the request was abandoned."""
+    entries = [(usage, endpoint) for usage in usages if usage["input_tokens"]]
+    if entries:
+        await log_completions(session, client_id, model, entries)
+        await session.commit()
+
+
+def unavailable(e: CircuitOpen) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+
+async def allowed_model(
+    session: AsyncSession, client: Client, model_name: str
+) -> CatalogModel:
+    await catalog.ensure_fresh(session)
+
+    if not catalog.is_allowed(client.id, model_name):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Model not allowed"
+        )
+
+    model = catalog.get(model_name)
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Model not found"
+        )
+    return model
+
+
+@client_router.post("/chat/completions", dependencies=[Depends(enforce_rate_limit)])
 async def completions(
     chat_request: ChatRequestSchema,
+    request: Request,
     client: Client = Depends(get_current_client),
     session: AsyncSession = Depends(get_session),
+    deadline: Deadline = Depends(request_deadline),
 ):
     if len(chat_request.prompt) > MAX_USER_CHARS:
         raise HTTPException(
@@ -33,68 +112,419 @@ async def completions(
             detail=f"Maximum characters exceeded: Maximum {MAX_USER_CHARS}",
         )
 
-    await session.refresh(client, attribute_names=["models"])
-    allowed_models = [m.model_name for m in client.models]
+    model = await allowed_model(session, client, chat_request.model)
 
-    if chat_request.model not in allowed_models:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Model not allowed"
+    usage = empty_usage()
+    try:
+        question_result = await cancel_on_disconnect(
+            request,
+            question(
+                client.id,
+                chat_request.prompt,
+                chat_request.model,
+                model.token_limit,
+                client.min_relevance_score,
+                deadline,
+                usage,
+            ),
         )
+    except DeadlineExceeded as e:
+        metrics.incr("completions.deadline_exceeded")
+        await log_partial_completions(
+            session, client.id, model, [usage], "chat/completions:deadline"
+        )
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except ClientDisconnected:
+        metrics.incr("completions.disconnected")
+        await log_partial_completions(
+            session, client.id, model, [usage], "chat/completions:disconnected"
+        )
+        return Response(status_code=HTTP_499_CLIENT_CLOSED_REQUEST)
+    except CircuitOpen as e:
+        metrics.incr("completions.unavailable")
+        raise unavailable(e)
 
-    question_result = question(client.id, chat_request.prompt, chat_request.model)
     usage = question_result["usage"]
     response_text = question_result["response"]
 
-    result = await session.execute(
-        select(Model).where(Model.model_name == chat_request.model)
+    metrics.incr("completions.total")
+    if not question_result["answered"]:
+        metrics.incr("completions.no_answer")
+
+    [(log, cost)] = await log_completions(
+        session, client.id, model, [(usage, "chat/completions")]
     )
-    model = result.scalars().first()
-    if not model:
+
+    await session.commit()
+    await session.refresh(log)
+
+    return {
+        "response": response_text,
+        "usage": {
+            "input_tokens": usage["input_tokens"],
+            "output_tokens": usage["output_tokens"],
+            "total_tokens": usage["total_tokens"],
+            "context_tokens": usage["context_tokens"],
+            "cost": round(cost, 4),
+        },
+        "answered": question_result["answered"],
+    }
+
+
+@client_router.post("/chat/completions/batch")
+async def batch_completions(
+    batch_request: BatchChatRequestSchema,
+    request: Request,
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+    deadline: Deadline = Depends(request_deadline),
+):
+    prompts = batch_request.prompts
+    if not prompts or len(prompts) > BATCH_MAX_PROMPTS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Model not found"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch takes between 1 and {BATCH_MAX_PROMPTS} prompts",
+        )
+    too_long = [i for i, prompt in enumerate(prompts) if len(prompt) > MAX_USER_CHARS]
+    if too_long:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Maximum characters exceeded: Maximum {MAX_USER_CHARS} "
+            f"(prompts {too_long})",
         )
 
-    input_tokens = usage["input_tokens"]
-    output_tokens = usage["output_tokens"]
-    total_tokens = usage["total_tokens"]
+    if RATE_LIMIT_PER_MINUTE and await hit_rate_limit(
+        session, client.id, RATE_LIMIT_PER_MINUTE, hits=len(prompts)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Rate limit exceeded"
+        )
 
-    if chat_request.model.startswith("gpt-"):
-        cost = calculate_openai_cost(
-            input_price=model.input_price,
-            output_price=model.output_price,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
+    model = await allowed_model(session, client, batch_request.model)
+
+    usages = [empty_usage() for _ in prompts]
+    try:
+        results = await cancel_on_disconnect(
+            request,
+            question_batch(
+                client.id,
+                prompts,
+                batch_request.model,
+                model.token_limit,
+                client.min_relevance_score,
+                deadline,
+                usages,
+                BATCH_CONCURRENCY,
+            ),
+        )
+    except DeadlineExceeded as e:
+        metrics.incr("completions.deadline_exceeded")
+        await log_partial_completions(
+            session, client.id, model, usages, "chat/completions/batch:deadline"
         )
-    elif chat_request.model.startswith("gemini-"):
-        cost = calculate_gemini_cost(
-            input_price=model.input_price,
-            output_price=model.output_price,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except ClientDisconnected:
+        metrics.incr("completions.disconnected")
+        await log_partial_completions(
+            session, client.id, model, usages, "chat/completions/batch:disconnected"
         )
-    else:
+        return Response(status_code=HTTP_499_CLIENT_CLOSED_REQUEST)
+    except CircuitOpen as e:
+        metrics.incr("completions.unavailable")
+        raise unavailable(e)
+
+    # como em /chat/completions: só o consumo parcial de itens que estouraram
+    # o prazo é cobrado; falhas do provedor e circuito aberto não
+    billed = [
+        "error" not in result
+        or (result["reason"] == "deadline" and result["usage"]["input_tokens"])
+        for result in results
+    ]
+    entries = []
+    for result, bill in zip(results, billed):
+        if not bill:
+            continue
+        if "error" not in result:
+            entries.append((result["usage"], "chat/completions/batch"))
+        else:
+            entries.append((result["usage"], "chat/completions/batch:deadline"))
+    logged = iter(await log_completions(session, client.id, model, entries))
+    await session.commit()
+
+    metrics.incr("completions.batches")
+    items = []
+    total_cost = Decimal("0")
+    for index, (result, bill) in enumerate(zip(results, billed)):
+        usage = result["usage"]
         cost = Decimal("0")
+        if bill:
+            _, cost = next(logged)
+        total_cost += cost
+
+        item = {
+            "index": index,
+            "usage": {
+                "input_tokens": usage["input_tokens"],
+                "output_tokens": usage["output_tokens"],
+                "total_tokens": usage["total_tokens"],
+                "context_tokens": usage["context_tokens"],
+                "cost": round(cost, 4),
+            },
+        }
+        if "error" in result:
+            metrics.incr("completions.batch_errors")
+            item["error"] = result["error"]
+        else:
+            metrics.incr("completions.total")
+            if not result["answered"]:
+                metrics.incr("completions.no_answer")
+            item["response"] = result["response"]
+            item["answered"] = result["answered"]
+        items.append(item)
+
+    return {
+        "results": items,
+        "usage": {
+            "input_tokens": sum(usage["input_tokens"] for usage in usages),
+            "output_tokens": sum(usage["output_tokens"] for usage in usages),
+            "total_tokens": sum(usage["total_tokens"] for usage in usages),
+            "cost": round(total_cost, 4),
+        },
+    }
+
+
+@client_router.post("/embeddings", dependencies=[Depends(enforce_rate_limit)])
+async def embeddings(
+    embedding_request: EmbeddingRequestSchema,
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+    deadline: Deadline = Depends(request_deadline),
+):
+    texts = embedding_request.input
+    if isinstance(texts, str):
+        texts = [texts]
+    if not texts or len(texts) > EMBEDDING_MAX_INPUTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Input takes between 1 and {EMBEDDING_MAX_INPUTS} texts",
+        )
 
-    log = RequestLog(
-        client_id=client.id,
-        endpoint="chat/completions",
-        input_tokens=input_tokens,
-        output_tokens=output_tokens,
-        total_tokens=total_tokens,
-        cost=cost,
-        model_used=chat_request.model,
+    model = await allowed_model(session, client, embedding_request.model)
+    if not is_embedding_model(model.model_name):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Not an embeddings model"
+        )
+
+    tokens = [int(count_tokens(text, model.model_name)) for text in texts]
+    too_long = [i for i, count in enumerate(tokens) if not count]
+    if model.token_limit:
+        too_long += [i for i, count in enumerate(tokens) if count > model.token_limit]
+    if too_long:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Inputs must be non-empty and at most {model.token_limit} "
+            f"tokens (inputs {sorted(too_long)})",
+        )
+
+    try:
+        vectors = await deadline.run(
+            batcher.embed(model.model_name, texts), "embedding"
+        )
+    except DeadlineExceeded as e:
+        metrics.incr("embeddings.deadline_exceeded")
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except CircuitOpen as e:
+        metrics.incr("embeddings.unavailable")
+        raise unavailable(e)
+    except Exception as e:
+        print(f"Embedding failed for client {client.id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail="Upstream error"
+        )
+
+    total_tokens = sum(tokens)
+    cost = model.cost(total_tokens, 0)
+    session.add(
+        UploadLog(
+            client_id=client.id,
+            upload_cost=cost,
+            embedding_tokens=total_tokens,
+            model_used=model.model_name,
+        )
+    )
+    await record_usage(
+        session, client.id, model.model_name, embedding_tokens=total_tokens, cost=cost
     )
-    session.add(log)
+    await session.commit()
+
+    metrics.incr("embeddings.requests")
+    metrics.incr("embeddings.inputs", len(texts))
+    encode = encode_base64 if embedding_request.encoding_format == "base64" else list
+    return {
+        "data": [
+            {"index": index, "embedding": encode(vector)}
+            for index, vector in enumerate(vectors)
+        ],
+        "model": model.model_name,
+        "usage": {"input_tokens": total_tokens, "cost": round(cost, 4)},
+    }
 
+
+async def owned_conversation(
+    session: AsyncSession, client: Client, conversation_id: int
+) -> Conversation:
+    conversation = await session.get(Conversation, conversation_id)
+    if not conversation or conversation.client_id != client.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found"
+        )
+    return conversation
+
+
+@client_router.post("/conversations")
+async def create_conversation(
+    data: ConversationSchema,
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+):
+    await allowed_model(session, client, data.model)
+
+    conversation = Conversation(client.id, data.model)
+    session.add(conversation)
     await session.commit()
-    await session.refresh(log)
+    await session.refresh(conversation)
+
+    return {"conversation_id": conversation.id, "model": conversation.model}
+
+
+@client_router.get("/conversations/{conversation_id}")
+async def get_conversation(
+    conversation_id: int,
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+):
+    conversation = await owned_conversation(session, client, conversation_id)
+    result = await session.execute(
+        select(ConversationTurn)
+        .where(ConversationTurn.conversation_id == conversation.id)
+        .order_by(ConversationTurn.id)
+    )
 
     return {
-        "response": response_text,
+        "conversation_id": conversation.id,
+        "model": conversation.model,
+        "summary": conversation.summary,
+        "turns": [
+            {
+                "id": turn.id,
+                "prompt": turn.question,
+                "response": turn.answer,
+                "reused_context": turn.reused_context,
+                "summarized": turn.id <= conversation.summary_turn_id,
+                "created_at": turn.created_at,
+            }
+            for turn in result.scalars().all()
+        ],
+    }
+
+
+@client_router.delete("/conversations/{conversation_id}")
+async def delete_conversation(
+    conversation_id: int,
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+):
+    conversation = await owned_conversation(session, client, conversation_id)
+    await session.execute(
+        delete(ConversationTurn).where(
+            ConversationTurn.conversation_id == conversation.id
+        )
+    )
+    await session.execute(
+        delete(Conversation).where(Conversation.id == conversation.id)
+    )
+    await session.commit()
+
+    return {"response": "Conversation deleted"}
+
+
+@client_router.post(
+    "/conversations/{conversation_id}/messages",
+    dependencies=[Depends(enforce_rate_limit)],
+)
+async def conversation_message(
+    conversation_id: int,
+    message: ConversationMessageSchema,
+    request: Request,
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+    deadline: Deadline = Depends(request_deadline),
+):
+    if len(message.prompt) > MAX_USER_CHARS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Maximum characters exceeded: Maximum {MAX_USER_CHARS}",
+        )
+
+    conversation = await owned_conversation(session, client, conversation_id)
+    model = await allowed_model(session, client, conversation.model)
+    turns = await pending_turns(session, conversation)
+
+    usage = empty_usage()
+    try:
+        result = await cancel_on_disconnect(
+            request,
+            reply(
+                conversation,
+                turns,
+                message.prompt,
+                model,
+                client.min_relevance_score,
+                deadline,
+                usage,
+            ),
+        )
+    except DeadlineExceeded as e:
+        metrics.incr("completions.deadline_exceeded")
+        await log_partial_completions(
+            session, client.id, model, [usage], "conversations:deadline"
+        )
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except ClientDisconnected:
+        metrics.incr("completions.disconnected")
+        await log_partial_completions(
+            session, client.id, model, [usage], "conversations:disconnected"
+        )
+        return Response(status_code=HTTP_499_CLIENT_CLOSED_REQUEST)
+    except CircuitOpen as e:
+        metrics.incr("completions.unavailable")
+        raise unavailable(e)
+
+    usage = result["usage"]
+    metrics.incr("completions.total")
+    metrics.incr("conversations.turns")
+    if not result["answered"]:
+        metrics.incr("completions.no_answer")
+
+    needs_summary = add_turn(session, conversation, turns, message.prompt, result)
+    [(log, cost)] = await log_completions(
+        session, client.id, model, [(usage, "conversations/messages")]
+    )
+    await session.commit()
+
+    if needs_summary:
+        schedule_summary(conversation.id, model)
+
+    return {
+        "conversation_id": conversation.id,
+        "response": result["response"],
         "usage": {
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": total_tokens,
+            "input_tokens": usage["input_tokens"],
+            "output_tokens": usage["output_tokens"],
+            "total_tokens": usage["total_tokens"],
+            "context_tokens": usage["context_tokens"],
             "cost": round(cost, 4),
         },
+        "answered": result["answered"],
+        "reused_context": result["reused_context"],
     }
@@ -1,41 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from fastapi.responses import FileResponse, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    File,
+    UploadFile,
+    Request,
+)
+from fastapi.responses import FileResponse, HTMLResponse, Response
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy import select
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime
 
 from app.core.config import RECEIPTS_DIR, BASE_URL, ADMIN_EMAIL, COMPANY_NAME
 
 from app.db.session import get_session
-from app.db.base import async_session
-from app.db.model.payment import Billing
+from app.db.model.payment import Billing, InvoiceRun
 from app.db.model.client import Client
 
 from app.services.admin import verify_admin_key
-from app.services.client import send_invoice, get_billings_due_today
-from app.utils.generators import generate_receipt_pdf
+from app.services.archive import archive_paid_billings, rebuild_invoice
+from app.services.client import send_invoice
+from app.services.invoice import run_invoice_pipeline
+from app.services.receipt import (
+    get_cached_receipt_pdf,
+    receipt_etag,
+    render_receipt_pdf,
+)
 
-from app.services.mail.utils.sender import send_email
+from app.services.mail.outbox import send_email
 from app.services.mail.utils.renders import (
     render_billing_paid_html,
     render_client_receipt_html,
+    render_invoice_html,
     render_verify_billing_html,
 )
 
 from app.schemas.payment import BillingShema, UpdateBillingSchema
 
 
+import asyncio
 import os
 
 
 payment_router = APIRouter(prefix="/billing", tags=["billing"])
 
-scheduler = AsyncIOScheduler()
-
 os.makedirs(RECEIPTS_DIR, exist_ok=True)
 
 
@@ -96,10 +108,73 @@ async def update_billing(
 
 
 async def send_invoice_schedule():
-    async with async_session() as session:
-        billings = await get_billings_due_today(session)
-        for billing in billings:
-            await send_invoice(billing, session)
+    return await run_invoice_pipeline()
+
+
+@payment_router.get("/invoice_runs", dependencies=[Depends(verify_admin_key)])
+async def invoice_runs(limit: int = 30, session: AsyncSession = Depends(get_session)):
+    result = await session.execute(
+        select(InvoiceRun).order_by(InvoiceRun.run_date.desc()).limit(limit)
+    )
+    runs = result.scalars().all()
+
+    return [
+        {
+            "run_date": run.run_date,
+            "total": run.total,
+            "sent": run.sent,
+            "failed": run.failed,
+            "duration": run.duration,
+            "throughput": run.sent / run.duration if run.duration else None,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+        }
+        for run in runs
+    ]
+
+
+@payment_router.post("/archive", dependencies=[Depends(verify_admin_key)])
+async def archive_billed_logs():
+    return await archive_paid_billings()
+
+
+@payment_router.get("/invoice/{billing_id}", dependencies=[Depends(verify_admin_key)])
+async def past_invoice(
+    billing_id: int, format: str = "json", session: AsyncSession = Depends(get_session)
+):
+    billing = await session.get(Billing, billing_id)
+    if not billing or (
+        billing.last_request_log_id is None and billing.last_upload_log_id is None
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unavailable")
+
+    data = await rebuild_invoice(session, billing)
+
+    if format == "html":
+        client = await session.get(Client, billing.client_id)
+        html_content = await asyncio.to_thread(
+            render_invoice_html,
+            client,
+            data["req_logs"],
+            data["upload_logs"],
+            data["client_amount"],
+            None,
+            None,
+        )
+        return HTMLResponse(html_content)
+
+    return {
+        "billing_id": billing.id,
+        "client_id": billing.client_id,
+        "status": billing.status,
+        "archived_at": billing.archived_at,
+        "amount_due": billing.amount_due,
+        "client_amount": data["client_amount"],
+        "req_cost": data["req_cost"],
+        "upload_cost": data["upload_cost"],
+        "requests": len(data["req_logs"]),
+        "uploads": len(data["upload_logs"]),
+    }
 
 
 @payment_router.get("/billing/validate/{pay_hash}")
@@ -232,7 +307,7 @@ async def download_receipt(
 
 @payment_router.get("/client/download/receipt/{billing_id}")
 async def client_download_receipt(
-    billing_id: str, session: AsyncSession = Depends(get_session)
+    billing_id: str, request: Request, session: AsyncSession = Depends(get_session)
 ):
     result = await session.execute(
         select(Billing)
@@ -244,6 +319,15 @@ async def client_download_receipt(
     if not billing:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unavailable")
 
+    filename = f"recibo_{billing.id}.pdf"
+
+    if billing.status:
+        etag = receipt_etag(billing.id)
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
     client = billing.client
 
     issue_date = datetime.now().date()
@@ -266,14 +350,19 @@ async def client_download_receipt(
         client, billing, issue_date, COMPANY_NAME
     )
 
-    pdf_bytes = generate_receipt_pdf(
-        html_template, context, f"recibo_{context['billing']['id']}.pdf"
-    )
+    if billing.status:
+        path = await get_cached_receipt_pdf(billing.id, html_template, context)
+        return FileResponse(
+            path=path,
+            media_type="application/pdf",
+            filename=filename,
+            headers={"ETag": etag, "Cache-Control": "private, max-age=86400"},
+        )
+
+    pdf_bytes = await render_receipt_pdf(html_template, context, filename)
 
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=recibo_{billing_id}.pdf"
-        },
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 from decimal import Decimal
 from jinja2 import Environment, FileSystemLoader
@@ -19,13 +20,79 @@ SMTP_PORT = os.getenv("SMTP_PORT")
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_FROM_ADDRESS = os.getenv("SMTP_FROM_ADDRESS")
+SMTP_TIMEOUT = 30
+
+MAIL_BACKEND = os.getenv("MAIL_BACKEND", "smtp")
+MAIL_DIR = "./mail"
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF_SECONDS = 30
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+OUTBOX_POLL_INTERVAL = 5
 
 
 DATABASE_PATH = "database"
+LEADER_LOCK_PATH = f"{DATABASE_PATH}/leader.lock"
+LEADER_RETRY_INTERVAL = 15
+CATALOG_CHECK_INTERVAL = 5
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", 0))
 VALUE_PER_REQUEST = Decimal(0.000005)
 PRICE_PER_1K_TOKENS = 0.02
 PRICE_PER_1M_TOKENS = 0.35
 MAX_USER_CHARS = 500
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 60))
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", 300))
+DISCONNECT_POLL_INTERVAL = 0.5
+HEDGE_LLM = os.getenv("HEDGE_LLM", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 0.5))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", 200))
+HEDGE_MODELS = json.loads(os.getenv("HEDGE_MODELS", "{}"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 50))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 10))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", 0.5))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", 20))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", 0.5))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", 1))
+LLM_FALLBACKS = json.loads(os.getenv("LLM_FALLBACKS", "{}"))
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", 50))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+EMBEDDING_MAX_INPUTS = int(os.getenv("EMBEDDING_MAX_INPUTS", 256))
+EMBEDDING_BATCH_WINDOW = float(os.getenv("EMBEDDING_BATCH_WINDOW", 0.01))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 512))
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", 1500))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", 300))
+CONVERSATION_REUSE_SIMILARITY = float(os.getenv("CONVERSATION_REUSE_SIMILARITY", 0.85))
+
+MIN_RELEVANCE_SCORE = float(os.getenv("MIN_RELEVANCE_SCORE", 0.3))
+NO_ANSWER_RESPONSE = "Não encontrei essa informação na base de conhecimento."
+
+CONTEXT_BUDGET_RATIO = float(os.getenv("CONTEXT_BUDGET_RATIO", 0.25))
+CONTEXT_DEFAULT_TOKEN_LIMIT = 8192
+CONTEXT_CANDIDATES = 6
+CONTEXT_MIN_CHUNK_TOKENS = 50
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_LAYOUT = os.getenv("VECTOR_LAYOUT", "per_client")
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", 16))
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+VECTOR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", 0))
+VECTOR_RESCORE = os.getenv("VECTOR_RESCORE", "true").lower() == "true"
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", 4))
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", 64))
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 512))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 64))
+CHUNK_PROFILES = json.loads(os.getenv("CHUNK_PROFILES", "{}"))
+CHUNK_PARALLEL_MIN_CHARS = int(os.getenv("CHUNK_PARALLEL_MIN_CHARS", 200_000))
+
+WARMUP = os.getenv("WARMUP", "false").lower() == "true"
+PRELOAD_TENANTS = int(os.getenv("PRELOAD_TENANTS", 20))
+PRELOAD_WINDOW_DAYS = int(os.getenv("PRELOAD_WINDOW_DAYS", 7))
+PRELOAD_MEMORY_MB = int(os.getenv("PRELOAD_MEMORY_MB", 512))
+PRELOAD_INTERVAL = int(os.getenv("PRELOAD_INTERVAL", 900))
 
 CHAVE_PIX = os.getenv("CHAVE_PIX")
 CIDADE_PIX = os.getenv("CIDADE_PIX")
@@ -35,5 +102,12 @@ ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 BASE_URL = "https://seuservidor.com"
 
 
+PIX_CACHE_SIZE = 4096
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+INVOICE_CONCURRENCY = int(os.getenv("INVOICE_CONCURRENCY", 8))
+INVOICE_DELIVERY_CONCURRENCY = int(os.getenv("INVOICE_DELIVERY_CONCURRENCY", 4))
+
 RECEIPTS_DIR = "./receipts"
+RECEIPT_CACHE_DIR = "./receipts_cache"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
 COMPANY_NAME = "API Getaway"
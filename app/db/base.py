@@ -13,7 +13,84 @@ async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False
 
 Base = declarative_base()
 
+# colunas criadas depois das tabelas; create_all não altera tabelas existentes
+ADDED_COLUMNS = [
+    ("clients", "min_relevance_score", "FLOAT"),
+    ("client_upload_logs", "created_at", "DATETIME"),
+    ("billings", "first_request_log_id", "INTEGER"),
+    ("billings", "last_request_log_id", "INTEGER"),
+    ("billings", "first_upload_log_id", "INTEGER"),
+    ("billings", "last_upload_log_id", "INTEGER"),
+    ("billings", "archived_at", "DATETIME"),
+]
+
+
+def add_missing_columns(conn):
+    for table, column, ddl in ADDED_COLUMNS:
+        existing = {
+            row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")
+        }
+        if column not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            print(f"Added column {table}.{column}")
+
+
+# tabelas que passaram a usar AUTOINCREMENT -> consulta do menor valor que o
+# contador pode ter (ids já arquivados e apagados não estão mais na tabela)
+AUTOINCREMENT_TABLES = {
+    "client_req_logs": "SELECT max(last_request_log_id) FROM billings",
+    "client_upload_logs": "SELECT max(last_upload_log_id) FROM billings",
+}
+
+
+def rebuild_autoincrement(conn):
+    """SQLite só aceita AUTOINCREMENT na criação: recria a tabela e copia."""
+    for name, floor_sql in AUTOINCREMENT_TABLES.items():
+        sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (name,),
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            continue
+
+        old = f"{name}__old"
+        conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {old}")
+        indexes = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = ? AND sql IS NOT NULL",
+            (old,),
+        ).scalars()
+        for index in list(indexes):
+            conn.exec_driver_sql(f"DROP INDEX {index}")
+        Base.metadata.tables[name].create(conn)
+
+        old_columns = {
+            row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({old})")
+        }
+        columns = ", ".join(
+            column.name
+            for column in Base.metadata.tables[name].columns
+            if column.name in old_columns
+        )
+        conn.exec_driver_sql(
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {old}"
+        )
+        conn.exec_driver_sql(f"DROP TABLE {old}")
+
+        seq = max(
+            conn.exec_driver_sql(floor_sql).scalar() or 0,
+            conn.exec_driver_sql(f"SELECT max(id) FROM {name}").scalar() or 0,
+        )
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+        if seq:
+            conn.exec_driver_sql(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, seq)
+            )
+        print(f"Rebuilt {name} with AUTOINCREMENT (next id {seq + 1})")
+
 
 async def init_models():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(rebuild_autoincrement)
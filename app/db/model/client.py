@@ -52,6 +52,7 @@ class Client(Base):
         Numeric(precision=12, scale=6), nullable=True, default=Decimal("0.00")
     )
     upload_tokens = Column(Float, default=0)
+    min_relevance_score = Column(Float, nullable=True)
     active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     last_reset = Column(DateTime, server_default=func.now())
@@ -0,0 +1,67 @@
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Boolean,
+    Float,
+    Text,
+    DateTime,
+    func,
+    ForeignKey,
+)
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    client_id = Column(
+        Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False
+    )
+    model = Column(String, nullable=False)
+    turns = relationship(
+        "ConversationTurn",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="ConversationTurn.id",
+    )
+    # resumo das mensagens até summary_turn_id (inclusive)
+    summary = Column(Text, nullable=True)
+    summary_turn_id = Column(Integer, default=0, nullable=False)
+    # última busca na base: reaproveitada enquanto o assunto não muda
+    query_vector = Column(Text, nullable=True)
+    context = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __init__(self, client_id, model):
+        self.client_id = client_id
+        self.model = model
+        self.summary_turn_id = 0
+
+
+class ConversationTurn(Base):
+    __tablename__ = "conversation_turns"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(
+        Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False
+    )
+    conversation = relationship("Conversation", back_populates="turns")
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    tokens = Column(Float, default=0)
+    reused_context = Column(Boolean, default=False)
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __init__(self, conversation_id, question, answer, tokens, reused_context):
+        self.conversation_id = conversation_id
+        self.question = question
+        self.answer = answer
+        self.tokens = tokens
+        self.reused_context = reused_context
@@ -16,6 +16,8 @@ from decimal import Decimal
 
 class RequestLog(Base):
     __tablename__ = "client_req_logs"
+    # ids não podem ser reaproveitados depois que o arquivamento apaga linhas
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"))
@@ -52,6 +54,8 @@ class RequestLog(Base):
 
 class UploadLog(Base):
     __tablename__ = "client_upload_logs"
+    # ids não podem ser reaproveitados depois que o arquivamento apaga linhas
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"))
@@ -62,8 +66,39 @@ class UploadLog(Base):
     embedding_tokens = Column(Float, default=0)
     model_used = Column(String, nullable=True)
 
+    # default também no INSERT: a coluna adicionada por ALTER não tem DEFAULT
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+
     def __init__(self, client_id, upload_cost, embedding_tokens, model_used):
         self.client_id = client_id
         self.upload_cost = upload_cost
         self.embedding_tokens = embedding_tokens
         self.model_used = model_used
+
+
+class LogArchive(Base):
+    __tablename__ = "log_archives"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    billing_id = Column(Integer, ForeignKey("billings.id", ondelete="CASCADE"))
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"))
+    kind = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    rows = Column(Integer, default=0)
+    first_id = Column(Integer, nullable=True)
+    last_id = Column(Integer, nullable=True)
+    cost = Column(Numeric(precision=12, scale=6), default=Decimal("0.00"))
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __init__(
+        self, billing_id, client_id, kind, path, rows, first_id, last_id, cost
+    ):
+        self.billing_id = billing_id
+        self.client_id = client_id
+        self.kind = kind
+        self.path = path
+        self.rows = rows
+        self.first_id = first_id
+        self.last_id = last_id
+        self.cost = cost
@@ -0,0 +1,45 @@
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Text,
+    LargeBinary,
+    JSON,
+    DateTime,
+    func,
+)
+from app.db.base import Base
+from datetime import datetime
+
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+
+class OutboxMessage(Base):
+    __tablename__ = "mail_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    qrcode = Column(LargeBinary, nullable=True)
+    attachments = Column(JSON, nullable=True)
+
+    status = Column(String, default=OUTBOX_PENDING, index=True, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.now, nullable=False)
+
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    def __init__(self, to_email, subject, html_content, qrcode=None, attachments=None):
+        self.to_email = to_email
+        self.subject = subject
+        self.html_content = html_content
+        self.qrcode = qrcode
+        self.attachments = attachments
+        self.status = OUTBOX_PENDING
+        self.attempts = 0
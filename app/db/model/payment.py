@@ -3,10 +3,13 @@ from sqlalchemy import (
     String,
     Integer,
     Boolean,
+    Date,
     DateTime,
+    Float,
     func,
     ForeignKey,
     Numeric,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 
@@ -36,6 +39,13 @@ class Billing(Base):
     due_date = Column(Integer, nullable=True)
     paid_at = Column(DateTime(timezone=True), nullable=True)
 
+    # faixa de logs cobrada na fatura; usada para arquivar e reconstruí-la
+    first_request_log_id = Column(Integer, nullable=True)
+    last_request_log_id = Column(Integer, nullable=True)
+    first_upload_log_id = Column(Integer, nullable=True)
+    last_upload_log_id = Column(Integer, nullable=True)
+    archived_at = Column(DateTime(timezone=True), nullable=True)
+
     def __init__(
         self,
         client: str,
@@ -46,3 +56,54 @@ class Billing(Base):
 
     def __repr__(self):
         return f"<Billing id={self.id} client={self.client} due={self.due_date} status={self.status}>"
+
+
+INVOICE_PENDING = "pending"
+INVOICE_RENDERED = "rendered"
+INVOICE_SENT = "sent"
+INVOICE_FAILED = "failed"
+
+
+class InvoiceRun(Base):
+    __tablename__ = "invoice_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_date = Column(Date, unique=True, nullable=False)
+    tasks = relationship(
+        "InvoiceTask", back_populates="run", cascade="all, delete-orphan"
+    )
+    total = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    duration = Column(Float, nullable=True)
+
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __init__(self, run_date):
+        self.run_date = run_date
+
+
+class InvoiceTask(Base):
+    __tablename__ = "invoice_tasks"
+    __table_args__ = (UniqueConstraint("run_id", "billing_id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(
+        Integer, ForeignKey("invoice_runs.id", ondelete="CASCADE"), nullable=False
+    )
+    run = relationship("InvoiceRun", back_populates="tasks")
+    billing_id = Column(
+        Integer, ForeignKey("billings.id", ondelete="CASCADE"), nullable=False
+    )
+    stage = Column(String, default=INVOICE_PENDING, nullable=False)
+    error = Column(String, nullable=True)
+
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __init__(self, run_id, billing_id):
+        self.run_id = run_id
+        self.billing_id = billing_id
+        self.stage = INVOICE_PENDING
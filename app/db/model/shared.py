@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from app.db.base import Base
+
+
+class SharedCounter(Base):
+    __tablename__ = "shared_counters"
+
+    key = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+    def __init__(self, key, value=0, expires_at=None):
+        self.key = key
+        self.value = value
+        self.expires_at = expires_at
@@ -0,0 +1,34 @@
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Float,
+    DateTime,
+    ForeignKey,
+    Numeric,
+    Index,
+)
+from app.db.base import Base
+
+from decimal import Decimal
+
+
+class UsageRollup(Base):
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        Index("ix_usage_rollups_client_bucket", "period", "client_id", "bucket"),
+    )
+
+    period = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    client_id = Column(
+        Integer, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True
+    )
+    model = Column(String, primary_key=True)
+
+    requests = Column(Integer, default=0, nullable=False)
+    input_tokens = Column(Float, default=0, nullable=False)
+    output_tokens = Column(Float, default=0, nullable=False)
+    total_tokens = Column(Float, default=0, nullable=False)
+    embedding_tokens = Column(Float, default=0, nullable=False)
+    cost = Column(Numeric(precision=12, scale=6), default=Decimal("0.00"))
@@ -7,23 +7,59 @@ from app.api.v1.payment.routers import payment_router
 from app.api.v1.payment.routers import send_invoice_schedule
 
 from contextlib import asynccontextmanager
+import asyncio
 from app.db.base import init_models
+from app.utils.workers import shutdown_process_pool
+from app.services.mail.outbox import run_outbox_worker
+from app.services.leader import run_as_leader
+from app.services.shared_state import purge_expired_counters
+from app.services.archive import archive_paid_billings
+from app.services.warmup import warm_up
+from app.services.preload import run_preloader
+from app.utils.breaker import breaker_states
+from app.core.config import PRELOAD_TENANTS, WARMUP
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 scheduler = AsyncIOScheduler()
+leader_tasks: list[asyncio.Task] = []
+
+
+async def start_leader_jobs():
+    scheduler.add_job(send_invoice_schedule, CronTrigger(hour=22, minute=59))
+    scheduler.add_job(purge_expired_counters, CronTrigger(minute=0))
+    scheduler.add_job(archive_paid_billings, CronTrigger(hour=3, minute=30))
+    scheduler.start()
+    leader_tasks.append(asyncio.create_task(run_outbox_worker()))
+
+
+async def stop_leader_jobs():
+    if scheduler.running:
+        scheduler.shutdown()
+    for task in leader_tasks:
+        task.cancel()
+    await asyncio.gather(*leader_tasks, return_exceptions=True)
+    leader_tasks.clear()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_models()
 
-    scheduler.start()
-    scheduler.add_job(send_invoice_schedule, CronTrigger(hour=22, minute=59))
+    if WARMUP:
+        await warm_up()
+
+    leader = asyncio.create_task(run_as_leader(start_leader_jobs, stop_leader_jobs))
+    background = [leader]
+    if PRELOAD_TENANTS:
+        background.append(asyncio.create_task(run_preloader()))
 
     yield
-    scheduler.shutdown()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    shutdown_process_pool()
 
 
 app = FastAPI(
@@ -52,6 +88,17 @@ async def root():
     }
 
 
+@app.get("/health")
+async def health():
+    breakers = breaker_states()
+    degraded = [name for name, state in breakers.items() if state["state"] != "closed"]
+    return {
+        "status": "degraded" if degraded else "ok",
+        "degraded": degraded,
+        "breakers": breakers,
+    }
+
+
 app.include_router(client_router)
 app.include_router(admin_router)
 app.include_router(payment_router)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 
 
 class ClientSchema(BaseModel):
@@ -16,6 +16,7 @@ class ClientUpdateSchema(BaseModel):
     email: Optional[str] = None
     active: Optional[bool] = None
     monthly_limit: Optional[str] = None
+    min_relevance_score: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -29,6 +30,47 @@ class ChatRequestSchema(BaseModel):
         from_attributes = True
 
 
+class BatchChatRequestSchema(BaseModel):
+    prompts: list[str]
+    model: str
+
+
+class EmbeddingRequestSchema(BaseModel):
+    input: str | list[str]
+    model: str
+    encoding_format: Literal["float", "base64"] = "float"
+
+
+class ConversationSchema(BaseModel):
+    model: str
+
+
+class ConversationMessageSchema(BaseModel):
+    prompt: str
+
+
 class AddClientModelSchema(BaseModel):
     model_id: str
     client_id: str
+
+
+class BulkClientSchema(ClientSchema):
+    create_key: bool = True
+    model_ids: list[int] = []
+
+
+class BulkClientsSchema(BaseModel):
+    clients: list[BulkClientSchema]
+
+
+class BulkClientKeysSchema(BaseModel):
+    client_ids: list[int]
+
+
+class ClientModelLinkSchema(BaseModel):
+    client_id: int
+    model_id: int
+
+
+class BulkClientModelsSchema(BaseModel):
+    links: list[ClientModelLinkSchema]
@@ -0,0 +1,197 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Iterator
+import asyncio
+import gzip
+import json
+import os
+
+from app.core.config import ARCHIVE_DIR
+from app.db.base import async_session
+from app.db.model.log import LogArchive, RequestLog, UploadLog
+from app.db.model.payment import Billing
+from app.services.export import stream_usage_logs
+from app.utils.calculators import billing_totals
+
+# tipo -> (modelo, coluna de custo, atributo da faixa cobrada no Billing)
+ARCHIVE_KINDS = {
+    "requests": (RequestLog, "cost", "request_log_id"),
+    "uploads": (UploadLog, "upload_cost", "upload_log_id"),
+}
+
+
+def archive_path(client_id: int, billing_id: int, kind: str) -> str:
+    return os.path.join(ARCHIVE_DIR, str(client_id), f"{billing_id}-{kind}.ndjson.gz")
+
+
+async def _write_archive(kind: str, client_id: int, until_id: int, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        async for data in stream_usage_logs(
+            kind, client_id, compress=True, until_id=until_id
+        ):
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+async def archive_billing(billing_id: int) -> dict | None:
+    """
+    Move the paid billing's log rows (and any older ones still in the hot
+    tables) to compressed NDJSON files and delete them from SQLite.
+    """
+    async with async_session() as session:
+        billing = await session.get(Billing, billing_id)
+        if not billing or not billing.status or billing.archived_at:
+            return None
+
+        archived = {}
+        for kind, (model, cost_column, cutoff) in ARCHIVE_KINDS.items():
+            until_id = getattr(billing, f"last_{cutoff}")
+            if until_id is None:
+                continue
+
+            where = model.client_id == billing.client_id, model.id <= until_id
+            count, first_id, last_id, cost = (
+                await session.execute(
+                    select(
+                        func.count(model.id),
+                        func.min(model.id),
+                        func.max(model.id),
+                        func.coalesce(func.sum(getattr(model, cost_column)), 0),
+                    ).where(*where)
+                )
+            ).one()
+            if not count:
+                continue
+
+            path = archive_path(billing.client_id, billing.id, kind)
+            await _write_archive(kind, billing.client_id, until_id, path)
+            session.add(
+                LogArchive(
+                    billing.id,
+                    billing.client_id,
+                    kind,
+                    path,
+                    count,
+                    first_id,
+                    last_id,
+                    Decimal(str(cost)),
+                )
+            )
+            await session.execute(delete(model).where(*where))
+            archived[kind] = count
+
+        billing.archived_at = datetime.now()
+        await session.commit()
+
+    return archived
+
+
+async def archive_paid_billings() -> dict:
+    async with async_session() as session:
+        result = await session.execute(
+            select(Billing.id)
+            .where(
+                Billing.status,
+                Billing.archived_at.is_(None),
+                Billing.last_request_log_id.is_not(None)
+                | Billing.last_upload_log_id.is_not(None),
+            )
+            .order_by(Billing.id)
+        )
+        billing_ids = result.scalars().all()
+
+    totals = {"billings": 0, "requests": 0, "uploads": 0}
+    for billing_id in billing_ids:
+        try:
+            archived = await archive_billing(billing_id)
+        except Exception as e:
+            print(f"Error archiving logs of billing {billing_id}: {e}")
+            continue
+        if archived is None:
+            continue
+        totals["billings"] += 1
+        for kind, count in archived.items():
+            totals[kind] += count
+
+    print(
+        f"Archived {totals['requests']} request and {totals['uploads']} upload "
+        f"logs from {totals['billings']} paid billings"
+    )
+    return totals
+
+
+def read_archive(path: str) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _archived_log(kind: str, row: dict) -> SimpleNamespace:
+    """Row with the same attributes as the ORM log, as the invoice reads it."""
+    row["created_at"] = row["created_at"] and datetime.fromisoformat(
+        row["created_at"]
+    )
+    cost_column = ARCHIVE_KINDS[kind][1]
+    row[cost_column] = Decimal(row[cost_column] or "0")
+    return SimpleNamespace(**row)
+
+
+def _read_logs(kind: str, path: str) -> list[SimpleNamespace]:
+    return [_archived_log(kind, row) for row in read_archive(path)]
+
+
+async def iter_archived_logs(session: AsyncSession, client_id: int | None = None):
+    stmt = select(LogArchive).order_by(LogArchive.id)
+    if client_id is not None:
+        stmt = stmt.where(LogArchive.client_id == client_id)
+    for archive in (await session.execute(stmt)).scalars().all():
+        # descompactar e parsear fora do loop, um arquivo por vez
+        logs = await asyncio.to_thread(_read_logs, archive.kind, archive.path)
+        for log in logs:
+            yield archive.kind, log
+
+
+async def billing_logs(session: AsyncSession, billing: Billing) -> dict:
+    """Logs charged in `billing`, read from the archive and the hot tables."""
+    logs = {}
+    for kind, (model, _, cutoff) in ARCHIVE_KINDS.items():
+        first_id = getattr(billing, f"first_{cutoff}")
+        last_id = getattr(billing, f"last_{cutoff}")
+        if last_id is None:
+            logs[kind] = []
+            continue
+
+        result = await session.execute(
+            select(LogArchive).where(
+                LogArchive.client_id == billing.client_id,
+                LogArchive.kind == kind,
+                LogArchive.first_id <= last_id,
+                LogArchive.last_id >= first_id,
+            )
+        )
+        rows = {}
+        for archive in result.scalars().all():
+            for row in await asyncio.to_thread(list, read_archive(archive.path)):
+                if first_id <= row["id"] <= last_id:
+                    rows[row["id"]] = _archived_log(kind, row)
+
+        result = await session.execute(
+            select(model).where(
+                model.client_id == billing.client_id,
+                model.id.between(first_id, last_id),
+            )
+        )
+        rows.update((log.id, log) for log in result.scalars().all())
+        logs[kind] = [rows[log_id] for log_id in sorted(rows)]
+    return logs
+
+
+async def rebuild_invoice(session: AsyncSession, billing: Billing) -> dict:
+    logs = await billing_logs(session, billing)
+    return billing_totals(logs["requests"], logs["uploads"])
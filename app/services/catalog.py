@@ -0,0 +1,126 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from dataclasses import dataclass
+from decimal import Decimal
+import asyncio
+import time
+
+from app.core.config import CATALOG_CHECK_INTERVAL
+from app.db.model.ai_model import Model
+from app.db.model.client import client_models
+from app.services.shared_state import bump_cache_version, get_cache_version
+
+CATALOG_CACHE = "catalog"
+
+PROVIDER_PRICE_UNITS = {
+    "openai": Decimal(1_000),
+    "gemini": Decimal(1_000_000),
+}
+
+
+def model_provider(model_name: str) -> str | None:
+    if model_name.startswith(("gpt-", "text-embedding-")):
+        return "openai"
+    elif model_name.startswith("gemini-"):
+        return "gemini"
+    return None
+
+
+def is_embedding_model(model_name: str) -> bool:
+    return "embedding" in model_name
+
+
+@dataclass(frozen=True)
+class CatalogModel:
+    id: int
+    model_name: str
+    provider: str | None
+    token_limit: int | None
+    input_unit_price: Decimal
+    output_unit_price: Decimal
+
+    @classmethod
+    def from_model(cls, model: Model):
+        provider = model_provider(model.model_name)
+        unit = PROVIDER_PRICE_UNITS.get(provider)
+
+        def unit_price(price) -> Decimal:
+            if unit is None or price is None:
+                return Decimal("0")
+            return Decimal(price) / unit
+
+        return cls(
+            id=model.id,
+            model_name=model.model_name,
+            provider=provider,
+            token_limit=model.token_limit,
+            input_unit_price=unit_price(model.input_price),
+            output_unit_price=unit_price(model.output_price),
+        )
+
+    def cost(self, input_tokens, output_tokens) -> Decimal:
+        return (Decimal(input_tokens) * self.input_unit_price) + (
+            Decimal(output_tokens) * self.output_unit_price
+        )
+
+
+class ModelCatalog:
+    """Per-worker copy of the model table and client allowlists.
+
+    Workers compare a shared cache version at most every
+    CATALOG_CHECK_INTERVAL seconds, so admin changes made through any
+    worker propagate without a query per request.
+    """
+
+    def __init__(self):
+        self.models: dict[str, CatalogModel] = {}
+        self.allowlists: dict[int, frozenset[str]] = {}
+        self.version = None
+        self.loaded = False
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, session: AsyncSession, version: int | None = None):
+        result = await session.execute(select(Model))
+        models = [CatalogModel.from_model(m) for m in result.scalars().all()]
+        names = {m.id: m.model_name for m in models}
+
+        result = await session.execute(
+            select(client_models.c.client_id, client_models.c.model_id)
+        )
+        allowlists: dict[int, set[str]] = {}
+        for client_id, model_id in result.all():
+            if model_id in names:
+                allowlists.setdefault(client_id, set()).add(names[model_id])
+
+        self.models = {m.model_name: m for m in models}
+        self.allowlists = {k: frozenset(v) for k, v in allowlists.items()}
+        self.version = version
+        self.loaded = True
+
+    async def ensure_fresh(self, session: AsyncSession):
+        now = time.monotonic()
+        if self.loaded and now - self.checked_at < CATALOG_CHECK_INTERVAL:
+            return
+
+        async with self._lock:
+            if self.loaded and now - self.checked_at < CATALOG_CHECK_INTERVAL:
+                return
+
+            version = await get_cache_version(session, CATALOG_CACHE)
+            if not self.loaded or version != self.version:
+                await self.refresh(session, version)
+            self.checked_at = time.monotonic()
+
+    async def invalidate(self, session: AsyncSession):
+        self.loaded = False
+        await bump_cache_version(session, CATALOG_CACHE)
+
+    def get(self, model_name: str) -> CatalogModel | None:
+        return self.models.get(model_name)
+
+    def is_allowed(self, client_id: int, model_name: str) -> bool:
+        return model_name in self.allowlists.get(client_id, ())
+
+
+catalog = ModelCatalog()
@@ -4,20 +4,24 @@ from app.db.model.payment import Billing
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.utils.calculators import calc_billing
-from app.utils.generators import generate_qrcode_pix, generate_pay_hash
+from app.utils.generators import generate_qrcode_pix_async, generate_pay_hash
 
 from app.services.mail.utils.renders import render_invoice_html
-from app.services.mail.utils.sender import send_email
+from app.services.mail.outbox import enqueue_email, notify_outbox
 from datetime import date
+import asyncio
 
 from fastapi.security import HTTPAuthorizationCredentials
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from app.api.security import security
 
 from sqlalchemy.orm import selectinload
 
 from app.db.model.client import ClientKey
 from app.db.session import get_session
+from app.services.shared_state import hit_rate_limit
+from app.utils.deadline import Deadline
+from app.core.config import MAX_REQUEST_TIMEOUT, RATE_LIMIT_PER_MINUTE, REQUEST_TIMEOUT
 
 
 async def get_current_client(
@@ -48,7 +52,31 @@ async def get_current_client(
     return client
 
 
-async def send_invoice(billing: Billing, session: AsyncSession):
+async def enforce_rate_limit(
+    client: Client = Depends(get_current_client),
+    session: AsyncSession = Depends(get_session),
+):
+    if not RATE_LIMIT_PER_MINUTE:
+        return
+
+    if await hit_rate_limit(session, client.id, RATE_LIMIT_PER_MINUTE):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Rate limit exceeded"
+        )
+
+
+async def request_deadline(
+    x_request_timeout: float | None = Header(default=None),
+) -> Deadline:
+    seconds = REQUEST_TIMEOUT if x_request_timeout is None else x_request_timeout
+    if seconds <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid X-Request-Timeout"
+        )
+    return Deadline(min(seconds, MAX_REQUEST_TIMEOUT))
+
+
+async def prepare_invoice(billing: Billing, session: AsyncSession) -> dict:
     client = await session.get(Client, billing.client_id)
     client_id = client.id
     data = await calc_billing(client_id, session)
@@ -58,35 +86,48 @@ async def send_invoice(billing: Billing, session: AsyncSession):
     client_amount = data["client_amount"]
 
     description = "By API Getaway"
-    pix_key, qrcode = generate_qrcode_pix(
+    pix_key, qrcode = await generate_qrcode_pix_async(
         client_id, client.name, client_amount, description
     )
 
     pay_hash = generate_pay_hash()
     pay_url = f"https://nextlevelcodeblog-front.vercel.app/{pay_hash}"
 
-    html_content = render_invoice_html(
-        client, req_logs, upload_logs, client_amount, pix_key, pay_url
+    html_content = await asyncio.to_thread(
+        render_invoice_html,
+        client,
+        req_logs,
+        upload_logs,
+        client_amount,
+        pix_key,
+        pay_url,
     )
 
     client.active = False
     billing.pay_hash = pay_hash
     billing.amount_due = client_amount
+    billing.first_request_log_id = min((log.id for log in req_logs), default=None)
+    billing.last_request_log_id = max((log.id for log in req_logs), default=None)
+    billing.first_upload_log_id = min((log.id for log in upload_logs), default=None)
+    billing.last_upload_log_id = max((log.id for log in upload_logs), default=None)
 
     session.add(billing)
     session.add(client)
-    await session.commit()
-    await session.refresh(billing)
-    await session.refresh(client)
 
-    subject = "API Getaway Fatura"
+    return {
+        "to_email": client.email,
+        "subject": "API Getaway Fatura",
+        "html_content": html_content,
+        "qrcode": qrcode,
+    }
 
-    await send_email(
-        client.email,
-        subject,
-        html_content,
-        qrcode,
-    )
+
+async def send_invoice(billing: Billing, session: AsyncSession):
+    message = await prepare_invoice(billing, session)
+    enqueue_email(session, **message)
+    await session.commit()
+
+    notify_outbox()
 
 
 async def get_billings_due_today(session: AsyncSession):
@@ -0,0 +1,208 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Any, Dict
+import asyncio
+import json
+import math
+
+from app.core.config import CONVERSATION_HISTORY_TOKENS, CONVERSATION_REUSE_SIMILARITY
+from app.db.base import async_session
+from app.db.model.conversation import Conversation, ConversationTurn
+from app.services import metrics
+from app.services.catalog import CatalogModel
+from app.services.usage import log_completions
+from app.utils.calculators import count_tokens
+from app.utils.deadline import Deadline
+from app.utils.text_response import (
+    answer,
+    embed_questions,
+    empty_usage,
+    open_client_db,
+    search,
+    summarize,
+)
+
+_summarizing: set[int] = set()
+_tasks: set[asyncio.Task] = set()
+
+
+def format_turns(turns: list[ConversationTurn]) -> str:
+    return "\n".join(
+        f"Usuário: {turn.question}\nAssistente: {turn.answer}" for turn in turns
+    )
+
+
+def history_window(turns: list[ConversationTurn], budget: int):
+    """
+    Divide os turnos ainda não resumidos (do mais antigo ao mais novo) em
+    (excedentes, janela): a janela são os mais recentes que cabem em `budget`.
+    """
+    window = []
+    used = 0
+    for turn in reversed(turns):
+        if used + turn.tokens > budget:
+            break
+        window.append(turn)
+        used += turn.tokens
+    window.reverse()
+    return turns[: len(turns) - len(window)], window
+
+
+async def pending_turns(
+    session: AsyncSession, conversation: Conversation
+) -> list[ConversationTurn]:
+    result = await session.execute(
+        select(ConversationTurn)
+        .where(
+            ConversationTurn.conversation_id == conversation.id,
+            ConversationTurn.id > conversation.summary_turn_id,
+        )
+        .order_by(ConversationTurn.id)
+    )
+    return list(result.scalars().all())
+
+
+def _similarity(a: list[float], b: list[float]) -> float:
+    if len(a) != len(b):
+        return 0.0
+    norm = math.hypot(*a) * math.hypot(*b)
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+
+def _load_context(conversation: Conversation) -> list:
+    from langchain.schema import Document
+
+    return [
+        (
+            Document(page_content=item["page_content"], metadata=item["metadata"]),
+            item["score"],
+        )
+        for item in json.loads(conversation.context)
+    ]
+
+
+def _save_context(conversation: Conversation, vector: list[float], results: list):
+    conversation.query_vector = json.dumps([float(value) for value in vector])
+    conversation.context = json.dumps(
+        [
+            {"page_content": doc.page_content, "metadata": doc.metadata, "score": score}
+            for doc, score in results
+        ]
+    )
+
+
+async def turn_results(
+    conversation: Conversation, prompt: str, model_name: str, deadline: Deadline
+) -> tuple[list, bool]:
+    """Busca na base, ou reaproveita a busca anterior se o assunto é o mesmo."""
+    db = await open_client_db(str(conversation.client_id), model_name, deadline)
+    if db is None:
+        return [], False
+
+    (vector,) = await embed_questions(model_name, [prompt], deadline)
+    if conversation.query_vector and conversation.context is not None:
+        previous = json.loads(conversation.query_vector)
+        if _similarity(vector, previous) >= CONVERSATION_REUSE_SIMILARITY:
+            metrics.incr("conversations.reused_context")
+            return _load_context(conversation), True
+
+    (results,) = await search(db, [vector], deadline)
+    _save_context(conversation, vector, results)
+    return results, False
+
+
+async def reply(
+    conversation: Conversation,
+    turns: list[ConversationTurn],
+    prompt: str,
+    model: CatalogModel,
+    min_relevance: float | None,
+    deadline: Deadline,
+    usage: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Responde `prompt` com o resumo da conversa e os turnos recentes que cabem
+    em CONVERSATION_HISTORY_TOKENS, para que o custo por turno não cresça.
+    """
+    _, window = history_window(turns, CONVERSATION_HISTORY_TOKENS)
+    results, reused = await turn_results(
+        conversation, prompt, model.model_name, deadline
+    )
+    result = await answer(
+        str(conversation.client_id),
+        prompt,
+        model.model_name,
+        results,
+        model.token_limit,
+        min_relevance,
+        deadline,
+        usage,
+        {
+            "summary": conversation.summary or "-",
+            "history": format_turns(window) or "-",
+        },
+    )
+    result["reused_context"] = reused
+    return result
+
+
+def add_turn(
+    session: AsyncSession,
+    conversation: Conversation,
+    turns: list[ConversationTurn],
+    prompt: str,
+    result: Dict[str, Any],
+) -> bool:
+    """Grava o turno; devolve True se turnos antigos já devem ir para o resumo."""
+    tokens = count_tokens(prompt + result["response"], conversation.model)
+    turn = ConversationTurn(
+        conversation.id, prompt, result["response"], tokens, result["reused_context"]
+    )
+    session.add(turn)
+    overflow, _ = history_window(turns + [turn], CONVERSATION_HISTORY_TOKENS)
+    return bool(overflow)
+
+
+async def update_summary(conversation_id: int, model: CatalogModel):
+    """Fold turns that left the history window into the rolling summary."""
+    try:
+        async with async_session() as session:
+            conversation = await session.get(Conversation, conversation_id)
+            if conversation is None:
+                return
+            # resume até caber em meia janela, para não resumir a cada turno
+            turns = await pending_turns(session, conversation)
+            overflow, _ = history_window(turns, CONVERSATION_HISTORY_TOKENS // 2)
+            if not overflow:
+                return
+
+            usage = empty_usage()
+            conversation.summary = await summarize(
+                conversation.summary, format_turns(overflow), model.model_name, usage
+            )
+            conversation.summary_turn_id = overflow[-1].id
+            await log_completions(
+                session,
+                conversation.client_id,
+                model,
+                [(usage, "conversations:summary")],
+            )
+            await session.commit()
+            metrics.incr("conversations.summaries")
+    except Exception as e:
+        print(f"Error summarizing conversation {conversation_id}: {e}")
+
+
+def schedule_summary(conversation_id: int, model: CatalogModel):
+    """Resume fora da requisição; o próximo turno usa o resumo quando pronto."""
+    if conversation_id in _summarizing:
+        return
+    _summarizing.add(conversation_id)
+    task = asyncio.create_task(update_summary(conversation_id, model))
+    _tasks.add(task)
+
+    def done(task: asyncio.Task):
+        _tasks.discard(task)
+        _summarizing.discard(conversation_id)
+
+    task.add_done_callback(done)
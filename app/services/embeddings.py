@@ -0,0 +1,98 @@
+from functools import lru_cache
+import asyncio
+import base64
+import struct
+
+from app.core.config import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WINDOW
+from app.services import metrics
+from app.services.catalog import model_provider
+from app.utils.breaker import guarded
+
+
+@lru_cache(maxsize=None)
+def embeddings_for_model(model_name: str):
+    """Provider client for an embeddings model sold through /v1/embeddings."""
+    if model_name.startswith("gemini-"):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=f"models/{model_name}")
+    if model_name.startswith("text-embedding-"):
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=model_name)
+    return None
+
+
+def encode_base64(vector: list[float]) -> str:
+    """Little-endian float32 bytes, the same layout OpenAI's base64 format uses."""
+    return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into larger provider calls.
+
+    Texts queued for the same model within `window` seconds are sent in a
+    single call; a batch that reaches `max_texts` is sent right away.
+    """
+
+    def __init__(self, window: float, max_texts: int):
+        self.window = window
+        self.max_texts = max_texts
+        self.pending: dict[str, list[tuple[list[str], asyncio.Future]]] = {}
+        self.sizes: dict[str, int] = {}
+        self.timers: dict[str, asyncio.TimerHandle] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    async def embed(self, model_name: str, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(model_name, []).append((texts, future))
+        self.sizes[model_name] = self.sizes.get(model_name, 0) + len(texts)
+
+        if self.sizes[model_name] >= self.max_texts:
+            self.flush(model_name)
+        elif model_name not in self.timers:
+            self.timers[model_name] = loop.call_later(
+                self.window, self.flush, model_name
+            )
+        return await future
+
+    def flush(self, model_name: str):
+        timer = self.timers.pop(model_name, None)
+        if timer is not None:
+            timer.cancel()
+        self.sizes.pop(model_name, None)
+        batch = self.pending.pop(model_name, [])
+        if batch:
+            task = asyncio.create_task(self._send(model_name, batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, model_name: str, batch):
+        # pedidos cancelados antes do envio não vão para o provedor
+        batch = [(texts, future) for texts, future in batch if not future.done()]
+        if not batch:
+            return
+
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        metrics.incr("embeddings.provider_calls")
+        metrics.incr("embeddings.batched_texts", len(texts))
+        try:
+            vectors = await guarded(
+                f"embeddings:{model_provider(model_name)}",
+                embeddings_for_model(model_name).aembed_documents(texts),
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for request_texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[start : start + len(request_texts)])
+            start += len(request_texts)
+
+
+batcher = EmbeddingBatcher(EMBEDDING_BATCH_WINDOW, EMBEDDING_BATCH_SIZE)
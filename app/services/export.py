@@ -0,0 +1,90 @@
+from sqlalchemy import select
+from datetime import datetime, date
+from decimal import Decimal
+from typing import AsyncIterator
+import csv
+import io
+import json
+import zlib
+
+from app.db.base import async_session
+from app.db.model.log import RequestLog, UploadLog
+
+EXPORT_TABLES = {
+    "requests": RequestLog.__table__,
+    "uploads": UploadLog.__table__,
+}
+EXPORT_CHUNK_ROWS = 1000
+
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_chunk(rows, columns: list[str], fmt: str, header: bool) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+        writer.writerows([[_jsonable(value) for value in row] for row in rows])
+        return buffer.getvalue().encode("utf-8")
+
+    return "".join(
+        json.dumps(
+            {column: _jsonable(value) for column, value in zip(columns, row)},
+            ensure_ascii=False,
+        )
+        + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+
+async def stream_usage_logs(
+    kind: str,
+    client_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    fmt: str = "ndjson",
+    compress: bool = False,
+    until_id: int | None = None,
+) -> AsyncIterator[bytes]:
+    table = EXPORT_TABLES[kind]
+    columns = [column.name for column in table.columns]
+
+    stmt = (
+        select(table)
+        .where(table.c.client_id == client_id)
+        .order_by(table.c.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    if start is not None:
+        stmt = stmt.where(table.c.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.created_at < end)
+    if until_id is not None:
+        stmt = stmt.where(table.c.id <= until_id)
+
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    header = True
+
+    async with async_session() as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            data = _encode_chunk(rows, columns, fmt, header)
+            header = False
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    if fmt == "csv" and header:
+        data = _encode_chunk([], columns, fmt, header)
+        yield compressor.compress(data) if compressor else data
+
+    if compressor:
+        yield compressor.flush()
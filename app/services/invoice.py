@@ -0,0 +1,191 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from datetime import date, datetime
+import asyncio
+import time
+
+from app.core.config import INVOICE_CONCURRENCY, INVOICE_DELIVERY_CONCURRENCY
+from app.db.base import async_session
+from app.db.model.payment import (
+    Billing,
+    InvoiceRun,
+    InvoiceTask,
+    INVOICE_FAILED,
+    INVOICE_RENDERED,
+    INVOICE_SENT,
+)
+from app.services.client import prepare_invoice, get_billings_due_today
+from app.services.mail.outbox import enqueue_email, notify_outbox
+
+
+async def get_or_create_invoice_run(session: AsyncSession, run_date: date):
+    result = await session.execute(
+        select(InvoiceRun).where(InvoiceRun.run_date == run_date)
+    )
+    run = result.scalars().first()
+
+    if not run:
+        run = InvoiceRun(run_date)
+        session.add(run)
+        await session.commit()
+        await session.refresh(run)
+
+    return run
+
+
+async def enqueue_invoice_tasks(session: AsyncSession, run: InvoiceRun) -> list[int]:
+    billings = await get_billings_due_today(session)
+
+    result = await session.execute(
+        select(InvoiceTask).where(InvoiceTask.run_id == run.id)
+    )
+    tasks = {task.billing_id: task for task in result.scalars().all()}
+
+    for billing in billings:
+        if billing.id not in tasks:
+            task = InvoiceTask(run.id, billing.id)
+            session.add(task)
+            tasks[billing.id] = task
+
+    run.total = len(tasks)
+    run.finished_at = None
+    await session.commit()
+
+    return [task.id for task in tasks.values() if task.stage != INVOICE_SENT]
+
+
+async def _set_task_stage(task_id: int, stage: str, error: str | None = None):
+    async with async_session() as session:
+        task = await session.get(InvoiceTask, task_id)
+        task.stage = stage
+        task.error = error
+        await session.commit()
+
+
+async def _mark_failed(task_id: int, error: Exception):
+    # o worker não pode morrer aqui, senão a fila nunca esvazia; a tarefa fica
+    # no estágio anterior e é retomada na próxima execução
+    try:
+        await _set_task_stage(task_id, INVOICE_FAILED, str(error))
+    except Exception as e:
+        print(f"Error marking invoice task {task_id} as failed: {e}")
+
+
+async def _render_invoice(task_id: int):
+    async with async_session() as session:
+        task = await session.get(InvoiceTask, task_id)
+        if task.stage == INVOICE_SENT:
+            return None
+
+        billing = await session.get(Billing, task.billing_id)
+        message = await prepare_invoice(billing, session)
+
+        task.stage = INVOICE_RENDERED
+        task.error = None
+        await session.commit()
+
+    return message
+
+
+async def _render_worker(render_queue: asyncio.Queue, delivery_queue: asyncio.Queue):
+    while True:
+        task_id = await render_queue.get()
+        try:
+            message = await _render_invoice(task_id)
+            if message:
+                await delivery_queue.put((task_id, message))
+        except Exception as e:
+            print(f"Error rendering invoice task {task_id}: {e}")
+            await _mark_failed(task_id, e)
+        finally:
+            render_queue.task_done()
+
+
+async def _deliver_invoice(task_id: int, message: dict):
+    async with async_session() as session:
+        task = await session.get(InvoiceTask, task_id)
+        if task.stage == INVOICE_SENT:
+            return
+
+        enqueue_email(session, **message)
+        task.stage = INVOICE_SENT
+        task.error = None
+        await session.commit()
+
+    notify_outbox()
+
+
+async def _delivery_worker(delivery_queue: asyncio.Queue):
+    while True:
+        task_id, message = await delivery_queue.get()
+        try:
+            await _deliver_invoice(task_id, message)
+        except Exception as e:
+            print(f"Error sending invoice task {task_id}: {e}")
+            await _mark_failed(task_id, e)
+        finally:
+            delivery_queue.task_done()
+
+
+async def run_invoice_pipeline(run_date: date | None = None) -> dict:
+    run_date = run_date or date.today()
+    started = time.perf_counter()
+
+    async with async_session() as session:
+        run = await get_or_create_invoice_run(session, run_date)
+        task_ids = await enqueue_invoice_tasks(session, run)
+        run_id = run.id
+
+    render_queue = asyncio.Queue()
+    delivery_queue = asyncio.Queue(maxsize=INVOICE_CONCURRENCY)
+    for task_id in task_ids:
+        render_queue.put_nowait(task_id)
+
+    workers = [
+        asyncio.create_task(_render_worker(render_queue, delivery_queue))
+        for _ in range(INVOICE_CONCURRENCY)
+    ] + [
+        asyncio.create_task(_delivery_worker(delivery_queue))
+        for _ in range(INVOICE_DELIVERY_CONCURRENCY)
+    ]
+
+    try:
+        await render_queue.join()
+        await delivery_queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    duration = time.perf_counter() - started
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(InvoiceTask.stage, func.count())
+            .where(InvoiceTask.run_id == run_id)
+            .group_by(InvoiceTask.stage)
+        )
+        counts = dict(result.all())
+
+        run = await session.get(InvoiceRun, run_id)
+        run.sent = counts.get(INVOICE_SENT, 0)
+        run.failed = counts.get(INVOICE_FAILED, 0)
+        run.duration = duration
+        run.finished_at = datetime.now()
+        await session.commit()
+
+    throughput = len(task_ids) / duration if duration else 0.0
+    print(
+        f"Invoice run {run_date}: {len(task_ids)} processed, {run.sent}/{run.total} "
+        f"sent, {run.failed} failed in {duration:.2f}s ({throughput:.2f} invoices/s)"
+    )
+
+    return {
+        "run_date": run_date,
+        "total": run.total,
+        "processed": len(task_ids),
+        "sent": run.sent,
+        "failed": run.failed,
+        "duration": duration,
+        "throughput": throughput,
+    }
@@ -0,0 +1,65 @@
+from typing import Awaitable, Callable
+import asyncio
+import fcntl
+import os
+
+from app.core.config import LEADER_LOCK_PATH, LEADER_RETRY_INTERVAL
+
+
+class FileLeaderLock:
+    """Exclusive flock held by the one worker that runs scheduled jobs.
+
+    The kernel drops the lock when the holding process exits, so another
+    worker takes over on its next retry.
+    """
+
+    def __init__(self, path: str = LEADER_LOCK_PATH):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+async def run_as_leader(
+    start: Callable[[], Awaitable[None]],
+    stop: Callable[[], Awaitable[None]],
+    lock: FileLeaderLock | None = None,
+):
+    lock = lock or FileLeaderLock()
+    try:
+        while not lock.try_acquire():
+            await asyncio.sleep(LEADER_RETRY_INTERVAL)
+
+        print(f"Worker {os.getpid()} elected leader for scheduled jobs")
+        await start()
+        await asyncio.Event().wait()
+    finally:
+        if lock.held:
+            await stop()
+            lock.release()
@@ -0,0 +1,163 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime, timedelta
+from typing import Optional
+from io import BytesIO
+import asyncio
+import base64
+
+from app.core.config import (
+    OUTBOX_BACKOFF_SECONDS,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_MAX_BACKOFF_SECONDS,
+    OUTBOX_POLL_INTERVAL,
+)
+from app.db.base import async_session
+from app.db.model.outbox import (
+    OutboxMessage,
+    OUTBOX_FAILED,
+    OUTBOX_PENDING,
+    OUTBOX_SENT,
+)
+from app.services.mail.utils.sender import build_message, get_mailer
+
+_outbox_event = asyncio.Event()
+
+
+def enqueue_email(
+    session: AsyncSession,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    qrcode: Optional[BytesIO | bytes] = None,
+    attachments: Optional[list[tuple[str, bytes]]] = None,
+) -> OutboxMessage:
+    if isinstance(qrcode, BytesIO):
+        qrcode = qrcode.getvalue()
+
+    if attachments:
+        attachments = [
+            [filename, base64.b64encode(file_bytes).decode("ascii")]
+            for filename, file_bytes in attachments
+        ]
+
+    message = OutboxMessage(to_email, subject, html_content, qrcode, attachments)
+    session.add(message)
+    return message
+
+
+async def send_email(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    qrcode: Optional[BytesIO | bytes] = None,
+    attachments: Optional[list[tuple[str, bytes]]] = None,
+) -> int:
+    async with async_session() as session:
+        message = enqueue_email(
+            session, to_email, subject, html_content, qrcode, attachments
+        )
+        await session.commit()
+        message_id = message.id
+
+    notify_outbox()
+    return message_id
+
+
+def notify_outbox():
+    _outbox_event.set()
+
+
+def _backoff(attempts: int) -> timedelta:
+    seconds = OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+async def deliver_outbox_batch(mailer=None) -> int:
+    mailer = mailer or get_mailer()
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(OutboxMessage)
+            .where(
+                OutboxMessage.status == OUTBOX_PENDING,
+                OutboxMessage.next_attempt_at <= datetime.now(),
+            )
+            .order_by(OutboxMessage.id)
+            .limit(OUTBOX_BATCH_SIZE)
+        )
+        messages = result.scalars().all()
+
+        if not messages:
+            return 0
+
+        mime_messages = [
+            build_message(
+                message.to_email,
+                message.subject,
+                message.html_content,
+                message.qrcode,
+                [
+                    (filename, base64.b64decode(content))
+                    for filename, content in message.attachments or []
+                ],
+            )
+            for message in messages
+        ]
+        errors = await asyncio.to_thread(mailer.send_messages, mime_messages)
+
+        now = datetime.now()
+        for message, error in zip(messages, errors):
+            message.attempts += 1
+
+            if error is None:
+                message.status = OUTBOX_SENT
+                message.sent_at = now
+                message.last_error = None
+            elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+                message.status = OUTBOX_FAILED
+                message.last_error = str(error)
+            else:
+                message.next_attempt_at = now + _backoff(message.attempts)
+                message.last_error = str(error)
+
+        await session.commit()
+
+    return len(messages)
+
+
+async def run_outbox_worker():
+    mailer = get_mailer()
+    try:
+        while True:
+            _outbox_event.clear()
+            try:
+                delivered = await deliver_outbox_batch(mailer)
+            except Exception as e:
+                print(f"Error delivering outbox batch: {e}")
+                delivered = 0
+
+            if delivered:
+                continue
+
+            try:
+                await asyncio.wait_for(_outbox_event.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        mailer.close()
+
+
+def outbox_message_status(message: OutboxMessage) -> dict:
+    return {
+        "id": message.id,
+        "to_email": message.to_email,
+        "subject": message.subject,
+        "status": message.status,
+        "attempts": message.attempts,
+        "last_error": message.last_error,
+        "next_attempt_at": message.next_attempt_at,
+        "created_at": message.created_at,
+        "sent_at": message.sent_at,
+    }
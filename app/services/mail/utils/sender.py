@@ -1,27 +1,33 @@
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
+from email.message import Message
 
 from typing import Optional
+from datetime import datetime
 
 from app.core.config import (
+    MAIL_BACKEND,
+    MAIL_DIR,
     SMTP_FROM_ADDRESS,
     SMTP_PASSWORD,
     SMTP_PORT,
     SMTP_SERVER,
+    SMTP_TIMEOUT,
     SMTP_USERNAME,
 )
 
+import os
 import smtplib
 
 
-async def send_email(
+def build_message(
     to_email: str,
     subject: str,
     html_content: str,
     qrcode: Optional[bytes] = None,
     attachments: Optional[list[tuple[str, bytes]]] = None,
-):
+) -> Message:
     msg = MIMEMultipart("related")
     msg["From"] = SMTP_FROM_ADDRESS
     msg["To"] = to_email
@@ -30,7 +36,7 @@ async def send_email(
     msg.attach(MIMEText(html_content, "html"))
 
     if qrcode:
-        image = MIMEImage(qrcode.getvalue())
+        image = MIMEImage(qrcode)
         image.add_header("Content-ID", "<qrcode>")
         msg.attach(image)
 
@@ -44,6 +50,104 @@ async def send_email(
             part.add_header("Content-Disposition", f'attachment; filename="{filename}"')
             msg.attach(part)
 
-    with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
+    return msg
+
+
+class SMTPMailer:
+    """Keeps one authenticated SMTP connection open across batches."""
+
+    def __init__(self):
+        self._server = None
+
+    def _connect(self):
+        server = smtplib.SMTP_SSL(SMTP_SERVER, int(SMTP_PORT), timeout=SMTP_TIMEOUT)
         server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.send_message(msg)
+        self._server = server
+
+    def _connection(self):
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+
+        self._connect()
+        return self._server
+
+    def send_messages(self, messages: list[Message]) -> list[Optional[Exception]]:
+        errors = []
+        for msg in messages:
+            try:
+                try:
+                    self._connection().send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    self.close()
+                    self._connection().send_message(msg)
+                errors.append(None)
+            except (smtplib.SMTPException, OSError) as e:
+                errors.append(e)
+        return errors
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+class MemoryMailer:
+    """Local SMTP stand-in that keeps delivered messages in memory."""
+
+    def __init__(self):
+        self.messages: list[Message] = []
+
+    def send_messages(self, messages: list[Message]) -> list[Optional[Exception]]:
+        self.messages.extend(messages)
+        return [None] * len(messages)
+
+    def close(self):
+        pass
+
+
+class FileMailer:
+    """Local SMTP stand-in that writes each message as an .eml file."""
+
+    def __init__(self, directory: str = MAIL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send_messages(self, messages: list[Message]) -> list[Optional[Exception]]:
+        errors = []
+        for msg in messages:
+            filename = f"{datetime.now():%Y%m%d%H%M%S%f}.eml"
+            try:
+                with open(os.path.join(self.directory, filename), "wb") as f:
+                    f.write(msg.as_bytes())
+                errors.append(None)
+            except OSError as e:
+                errors.append(e)
+        return errors
+
+    def close(self):
+        pass
+
+
+MAILERS = {
+    "smtp": SMTPMailer,
+    "memory": MemoryMailer,
+    "file": FileMailer,
+}
+
+_mailer = None
+
+
+def get_mailer():
+    global _mailer
+    if _mailer is None:
+        _mailer = MAILERS[MAIL_BACKEND]()
+    return _mailer
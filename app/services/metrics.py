@@ -0,0 +1,21 @@
+from collections import defaultdict
+import os
+
+_counters: dict[str, float] = defaultdict(float)
+
+
+def incr(name: str, amount: float = 1):
+    _counters[name] += amount
+
+
+def get(name: str) -> float:
+    return _counters.get(name, 0)
+
+
+def ratio(numerator: str, denominator: str) -> float | None:
+    total = get(denominator)
+    return get(numerator) / total if total else None
+
+
+def snapshot() -> dict:
+    return {"pid": os.getpid(), "counters": dict(sorted(_counters.items()))}
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from app.core.config import (
+    PRELOAD_INTERVAL,
+    PRELOAD_MEMORY_MB,
+    PRELOAD_TENANTS,
+    PRELOAD_WINDOW_DAYS,
+    VECTOR_STORE_CACHE_SIZE,
+)
+from app.db.base import async_session
+from app.services import metrics
+from app.services.usage import hot_tenants
+from app.utils.knowledge_base import (
+    preload_client_db,
+    store_cache_key,
+    store_footprint,
+)
+
+
+async def preload_hot_tenants() -> dict:
+    """Open the busiest clients' knowledge bases, hottest first, within budget."""
+    started = time.perf_counter()
+    async with async_session() as session:
+        tenants = await hot_tenants(session, PRELOAD_TENANTS, PRELOAD_WINDOW_DAYS)
+
+    budget = PRELOAD_MEMORY_MB * 1024 * 1024
+    used = 0
+    loaded = set()
+    skipped = 0
+
+    for client_id, model_name in tenants:
+        if len(loaded) >= VECTOR_STORE_CACHE_SIZE:
+            break
+        key = store_cache_key(client_id, model_name)
+        if key in loaded:
+            continue
+
+        try:
+            size = await asyncio.to_thread(store_footprint, client_id, model_name)
+            if not size:
+                continue
+            if used + size > budget:
+                skipped += 1
+                continue
+            if await asyncio.to_thread(preload_client_db, client_id, model_name):
+                used += size
+                loaded.add(key)
+        except Exception as e:
+            print(f"Preload failed for client {client_id}: {e}")
+
+    metrics.incr("preload.runs")
+    metrics.incr("preload.stores", len(loaded))
+    print(
+        f"Preloaded {len(loaded)} knowledge bases ({used / 1e6:.1f} MB, "
+        f"{skipped} over budget) in {time.perf_counter() - started:.2f}s"
+    )
+    return {"stores": len(loaded), "bytes": used, "skipped": skipped}
+
+
+async def run_preloader():
+    while True:
+        try:
+            await preload_hot_tenants()
+        except Exception as e:
+            print(f"Preload run failed: {e}")
+        await asyncio.sleep(PRELOAD_INTERVAL)
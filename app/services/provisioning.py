@@ -0,0 +1,154 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, tuple_
+
+from app.db.model.client import Client, ClientKey, client_models
+from app.db.model.ai_model import Model
+from app.schemas.client import BulkClientSchema, ClientModelLinkSchema
+from app.utils.generators import generate_secure_token
+
+
+async def _existing_ids(session: AsyncSession, column, values) -> set:
+    if not values:
+        return set()
+    result = await session.execute(select(column).where(column.in_(set(values))))
+    return set(result.scalars().all())
+
+
+async def bulk_create_clients(
+    session: AsyncSession, clients: list[BulkClientSchema]
+) -> dict:
+    errors = []
+    existing_emails = await _existing_ids(
+        session, Client.email, [c.email for c in clients]
+    )
+    known_models = await _existing_ids(
+        session, Model.id, [m for c in clients for m in c.model_ids]
+    )
+
+    accepted = []
+    seen_emails = set()
+    for index, item in enumerate(clients):
+        unknown_models = set(item.model_ids) - known_models
+        if item.email in existing_emails or item.email in seen_emails:
+            errors.append({"index": index, "detail": "Email unavailable"})
+        elif unknown_models:
+            errors.append(
+                {"index": index, "detail": f"Unknown models: {sorted(unknown_models)}"}
+            )
+        else:
+            seen_emails.add(item.email)
+            accepted.append((index, item))
+
+    if not accepted:
+        return {"created": [], "errors": errors}
+
+    result = await session.execute(
+        insert(Client).returning(Client.id, Client.email),
+        [
+            {
+                "name": item.name,
+                "email": item.email,
+                "monthly_limit": item.monthly_limit,
+            }
+            for _, item in accepted
+        ],
+    )
+    ids_by_email = {email: client_id for client_id, email in result.all()}
+
+    created = []
+    keys = []
+    links = []
+    for index, item in accepted:
+        client_id = ids_by_email[item.email]
+        entry = {"index": index, "client_id": client_id, "email": item.email}
+
+        if item.create_key:
+            entry["key"] = generate_secure_token()
+            keys.append({"client": client_id, "client_key_hash": entry["key"]})
+
+        links.extend(
+            {"client_id": client_id, "model_id": model_id}
+            for model_id in set(item.model_ids)
+        )
+        created.append(entry)
+
+    if keys:
+        await session.execute(insert(ClientKey), keys)
+    if links:
+        await session.execute(insert(client_models), links)
+
+    await session.commit()
+
+    return {"created": created, "errors": errors}
+
+
+async def bulk_create_client_keys(session: AsyncSession, client_ids: list[int]) -> dict:
+    known_clients = await _existing_ids(session, Client.id, client_ids)
+
+    created = []
+    errors = []
+    for index, client_id in enumerate(client_ids):
+        if client_id not in known_clients:
+            errors.append({"index": index, "detail": "Client unavailable"})
+            continue
+        created.append(
+            {"index": index, "client_id": client_id, "key": generate_secure_token()}
+        )
+
+    if created:
+        await session.execute(
+            insert(ClientKey),
+            [
+                {"client": entry["client_id"], "client_key_hash": entry["key"]}
+                for entry in created
+            ],
+        )
+        await session.commit()
+
+    return {"created": created, "errors": errors}
+
+
+async def bulk_add_client_models(
+    session: AsyncSession, links: list[ClientModelLinkSchema]
+) -> dict:
+    if not links:
+        return {"created": [], "errors": []}
+
+    known_clients = await _existing_ids(
+        session, Client.id, [link.client_id for link in links]
+    )
+    known_models = await _existing_ids(
+        session, Model.id, [link.model_id for link in links]
+    )
+
+    pairs = {(link.client_id, link.model_id) for link in links}
+    result = await session.execute(
+        select(client_models.c.client_id, client_models.c.model_id).where(
+            tuple_(client_models.c.client_id, client_models.c.model_id).in_(pairs)
+        )
+    )
+    linked = set(result.tuples().all())
+
+    created = []
+    errors = []
+    for index, link in enumerate(links):
+        pair = (link.client_id, link.model_id)
+        if link.client_id not in known_clients or link.model_id not in known_models:
+            errors.append({"index": index, "detail": "Unavailable"})
+        elif pair in linked:
+            errors.append({"index": index, "detail": "Already linked"})
+        else:
+            linked.add(pair)
+            created.append({"index": index, **link.model_dump()})
+
+    if created:
+        await session.execute(
+            insert(client_models),
+            [
+                {"client_id": entry["client_id"], "model_id": entry["model_id"]}
+                for entry in created
+            ],
+        )
+        await session.commit()
+
+    return {"created": created, "errors": errors}
@@ -0,0 +1,40 @@
+from functools import lru_cache
+import hashlib
+import os
+
+from app.core.config import RECEIPT_CACHE_DIR, env
+from app.utils.generators import generate_receipt_pdf, write_receipt_pdf
+from app.utils.workers import run_in_process
+
+os.makedirs(RECEIPT_CACHE_DIR, exist_ok=True)
+
+
+@lru_cache(maxsize=1)
+def receipt_template_version() -> str:
+    source, _, _ = env.loader.get_source(env, "receipt.html")
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+def receipt_etag(billing_id: int) -> str:
+    return f'"{billing_id}-{receipt_template_version()}"'
+
+
+def receipt_cache_path(billing_id: int) -> str:
+    return os.path.join(
+        RECEIPT_CACHE_DIR, f"recibo_{billing_id}_{receipt_template_version()}.pdf"
+    )
+
+
+async def get_cached_receipt_pdf(
+    billing_id: int, html_template: str, context: dict
+) -> str:
+    path = receipt_cache_path(billing_id)
+
+    if not os.path.exists(path):
+        await run_in_process(write_receipt_pdf, html_template, context, path)
+
+    return path
+
+
+async def render_receipt_pdf(html_template: str, context: dict, filename: str) -> bytes:
+    return await run_in_process(generate_receipt_pdf, html_template, context, filename)
@@ -0,0 +1,64 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy import select, delete
+from datetime import datetime, timedelta
+import time
+
+from app.db.base import async_session
+from app.db.model.shared import SharedCounter
+
+
+async def incr_counter(
+    session: AsyncSession, key: str, amount: int = 1, ttl: int | None = None
+) -> int:
+    expires_at = datetime.now() + timedelta(seconds=ttl) if ttl else None
+    stmt = (
+        insert(SharedCounter)
+        .values(key=key, value=amount, expires_at=expires_at)
+        .on_conflict_do_update(
+            index_elements=[SharedCounter.key],
+            set_={"value": SharedCounter.value + amount},
+        )
+        .returning(SharedCounter.value)
+    )
+    result = await session.execute(stmt)
+    value = result.scalar_one()
+    await session.commit()
+    return value
+
+
+async def get_counter(session: AsyncSession, key: str) -> int:
+    result = await session.execute(
+        select(SharedCounter.value).where(SharedCounter.key == key)
+    )
+    return result.scalar() or 0
+
+
+async def hit_rate_limit(
+    session: AsyncSession, client_id: int, limit: int, window: int = 60, hits: int = 1
+) -> bool:
+    bucket = int(time.time() // window)
+    key = f"rate:{client_id}:{bucket}"
+    total = await incr_counter(session, key, amount=hits, ttl=window * 2)
+    if total > limit:
+        # pedido recusado não consome a janela (um lote de 50 recusado
+        # deixaria o cliente sem limite até o próximo minuto)
+        await incr_counter(session, key, amount=-hits)
+        return True
+    return False
+
+
+async def bump_cache_version(session: AsyncSession, name: str) -> int:
+    return await incr_counter(session, f"version:{name}")
+
+
+async def get_cache_version(session: AsyncSession, name: str) -> int:
+    return await get_counter(session, f"version:{name}")
+
+
+async def purge_expired_counters():
+    async with async_session() as session:
+        await session.execute(
+            delete(SharedCounter).where(SharedCounter.expires_at < datetime.now())
+        )
+        await session.commit()
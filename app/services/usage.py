@@ -0,0 +1,353 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy import select, delete, func, and_, or_
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import asyncio
+
+from app.db.base import async_session
+from app.db.model.log import RequestLog, UploadLog
+from app.db.model.usage import UsageRollup
+from app.services.catalog import CatalogModel
+from app.services.archive import iter_archived_logs
+
+PERIODS = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+METRICS = (
+    "requests",
+    "input_tokens",
+    "output_tokens",
+    "total_tokens",
+    "embedding_tokens",
+    "cost",
+)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(at: datetime, period: str) -> datetime:
+    if period == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def _upsert_rollup(session: AsyncSession, values: dict):
+    stmt = insert(UsageRollup).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            UsageRollup.period,
+            UsageRollup.bucket,
+            UsageRollup.client_id,
+            UsageRollup.model,
+        ],
+        set_={
+            metric: getattr(UsageRollup, metric) + getattr(stmt.excluded, metric)
+            for metric in METRICS
+        },
+    )
+    await session.execute(stmt)
+
+
+async def record_usage(
+    session: AsyncSession,
+    client_id: int,
+    model: str | None,
+    requests: int = 0,
+    input_tokens: float = 0,
+    output_tokens: float = 0,
+    total_tokens: float = 0,
+    embedding_tokens: float = 0,
+    cost: Decimal = Decimal("0"),
+    at: datetime | None = None,
+):
+    at = at or utcnow()
+    for period in PERIODS:
+        await _upsert_rollup(
+            session,
+            {
+                "period": period,
+                "bucket": bucket_start(at, period),
+                "client_id": int(client_id),
+                "model": model or "",
+                "requests": requests,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": total_tokens,
+                "embedding_tokens": embedding_tokens,
+                "cost": cost,
+            },
+        )
+
+
+async def log_completions(
+    session: AsyncSession,
+    client_id: int,
+    model: CatalogModel,
+    entries: list[tuple[dict, str]],
+) -> list[tuple[RequestLog, Decimal]]:
+    """entries: [(usage, endpoint)]; rollups are updated once for all of them."""
+    logged = []
+    for usage, endpoint in entries:
+        cost = model.cost(usage["input_tokens"], usage["output_tokens"])
+        log = RequestLog(
+            client_id=client_id,
+            endpoint=endpoint,
+            input_tokens=usage["input_tokens"],
+            output_tokens=usage["output_tokens"],
+            total_tokens=usage["total_tokens"],
+            cost=cost,
+            model_used=model.model_name,
+        )
+        logged.append((log, cost))
+
+    if not logged:
+        return logged
+
+    session.add_all([log for log, _ in logged])
+    await record_usage(
+        session,
+        client_id,
+        model.model_name,
+        requests=len(logged),
+        input_tokens=sum(usage["input_tokens"] for usage, _ in entries),
+        output_tokens=sum(usage["output_tokens"] for usage, _ in entries),
+        total_tokens=sum(usage["total_tokens"] for usage, _ in entries),
+        cost=sum((cost for _, cost in logged), Decimal("0")),
+    )
+    return logged
+
+
+async def rebuild_usage_rollups():
+    async with async_session() as session:
+        await session.execute(delete(UsageRollup))
+
+        for period, fmt in PERIODS.items():
+            bucket = func.strftime(fmt, RequestLog.created_at).label("bucket")
+            result = await session.execute(
+                select(
+                    bucket,
+                    RequestLog.client_id,
+                    RequestLog.model_used,
+                    func.count(RequestLog.id),
+                    func.coalesce(func.sum(RequestLog.input_tokens), 0),
+                    func.coalesce(func.sum(RequestLog.output_tokens), 0),
+                    func.coalesce(func.sum(RequestLog.total_token_used), 0),
+                    func.coalesce(func.sum(RequestLog.cost), 0),
+                ).group_by(bucket, RequestLog.client_id, RequestLog.model_used)
+            )
+            for row in result.all():
+                await _upsert_rollup(
+                    session,
+                    {
+                        "period": period,
+                        "bucket": datetime.fromisoformat(row[0]),
+                        "client_id": row[1],
+                        "model": row[2] or "",
+                        "requests": row[3],
+                        "input_tokens": row[4],
+                        "output_tokens": row[5],
+                        "total_tokens": row[6],
+                        "embedding_tokens": 0,
+                        "cost": Decimal(str(row[7])),
+                    },
+                )
+
+            bucket = func.strftime(fmt, UploadLog.created_at).label("bucket")
+            result = await session.execute(
+                select(
+                    bucket,
+                    UploadLog.client_id,
+                    UploadLog.model_used,
+                    func.coalesce(func.sum(UploadLog.embedding_tokens), 0),
+                    func.coalesce(func.sum(UploadLog.upload_cost), 0),
+                ).group_by(bucket, UploadLog.client_id, UploadLog.model_used)
+            )
+            for row in result.all():
+                await _upsert_rollup(
+                    session,
+                    {
+                        "period": period,
+                        "bucket": datetime.fromisoformat(row[0] or "1970-01-01"),
+                        "client_id": row[1],
+                        "model": row[2] or "",
+                        "requests": 0,
+                        "input_tokens": 0,
+                        "output_tokens": 0,
+                        "total_tokens": 0,
+                        "embedding_tokens": row[3],
+                        "cost": Decimal(str(row[4])),
+                    },
+                )
+
+        # logs já faturados e arquivados continuam contando no histórico
+        archived: dict[tuple, dict] = {}
+        async for kind, log in iter_archived_logs(session):
+            if kind == "requests":
+                values = {
+                    "requests": 1,
+                    "input_tokens": log.input_tokens or 0,
+                    "output_tokens": log.output_tokens or 0,
+                    "total_tokens": log.total_token_used or 0,
+                    "cost": log.cost,
+                }
+            else:
+                values = {
+                    "embedding_tokens": log.embedding_tokens or 0,
+                    "cost": log.upload_cost,
+                }
+            # uploads anteriores à coluna created_at, como no SQL acima
+            created_at = log.created_at or datetime(1970, 1, 1)
+            for period in PERIODS:
+                bucket = bucket_start(created_at, period)
+                key = (period, bucket, log.client_id, log.model_used or "")
+                totals = archived.setdefault(key, {metric: 0 for metric in METRICS})
+                for metric, value in values.items():
+                    totals[metric] += value
+
+        for (period, bucket, client_id, model), totals in archived.items():
+            await _upsert_rollup(
+                session,
+                {
+                    "period": period,
+                    "bucket": bucket,
+                    "client_id": client_id,
+                    "model": model,
+                    **totals,
+                },
+            )
+
+        await session.commit()
+
+
+def _sums():
+    return [func.sum(getattr(UsageRollup, metric)).label(metric) for metric in METRICS]
+
+
+def _period_for_range(start: datetime, end: datetime) -> str:
+    if bucket_start(start, "day") == start and bucket_start(end, "day") == end:
+        return "day"
+    return "hour"
+
+
+async def usage_series(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    period: str = "day",
+    client_id: int | None = None,
+    model: str | None = None,
+    after: datetime | None = None,
+    limit: int = 100,
+) -> dict:
+    stmt = select(UsageRollup.bucket, *_sums()).where(
+        UsageRollup.period == period,
+        UsageRollup.bucket >= bucket_start(start, period),
+        UsageRollup.bucket < end,
+    )
+    if client_id is not None:
+        stmt = stmt.where(UsageRollup.client_id == client_id)
+    if model is not None:
+        stmt = stmt.where(UsageRollup.model == model)
+    if after is not None:
+        stmt = stmt.where(UsageRollup.bucket > after)
+
+    stmt = stmt.group_by(UsageRollup.bucket).order_by(UsageRollup.bucket).limit(limit)
+    rows = (await session.execute(stmt)).mappings().all()
+
+    return {
+        "period": period,
+        "items": [dict(row) for row in rows],
+        "next_after": rows[-1]["bucket"] if len(rows) == limit else None,
+    }
+
+
+async def top_usage(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    by: str = "client",
+    metric: str = "cost",
+    after_value: float | None = None,
+    after_key: str | None = None,
+    limit: int = 10,
+) -> dict:
+    key = UsageRollup.client_id if by == "client" else UsageRollup.model
+    period = _period_for_range(start, end)
+    value = func.sum(getattr(UsageRollup, metric))
+
+    stmt = (
+        select(key.label("key"), *_sums())
+        .where(
+            UsageRollup.period == period,
+            UsageRollup.bucket >= start,
+            UsageRollup.bucket < end,
+        )
+        .group_by(key)
+    )
+    if after_value is not None:
+        if after_key is None:
+            stmt = stmt.having(value < after_value)
+        else:
+            stmt = stmt.having(
+                or_(
+                    value < after_value,
+                    and_(value == after_value, key > _typed_key(by, after_key)),
+                )
+            )
+
+    stmt = stmt.order_by(value.desc(), key).limit(limit)
+    rows = (await session.execute(stmt)).mappings().all()
+
+    next_page = None
+    if len(rows) == limit:
+        next_page = {"after_value": rows[-1][metric], "after_key": rows[-1]["key"]}
+
+    return {
+        "by": by,
+        "metric": metric,
+        "period": period,
+        "items": [dict(row) for row in rows],
+        "next": next_page,
+    }
+
+
+def _typed_key(by: str, key: str):
+    return int(key) if by == "client" else key
+
+
+async def client_totals(session: AsyncSession, client_id: int) -> dict:
+    result = await session.execute(
+        select(*_sums()).where(
+            UsageRollup.period == "day", UsageRollup.client_id == client_id
+        )
+    )
+    row = result.mappings().first()
+    return {metric: row[metric] or 0 for metric in METRICS}
+
+
+async def hot_tenants(
+    session: AsyncSession, limit: int, days: int = 7
+) -> list[tuple[int, str]]:
+    since = bucket_start(utcnow() - timedelta(days=days), "day")
+    requests = func.sum(UsageRollup.requests)
+    result = await session.execute(
+        select(UsageRollup.client_id, UsageRollup.model)
+        .where(UsageRollup.period == "day", UsageRollup.bucket >= since)
+        .group_by(UsageRollup.client_id, UsageRollup.model)
+        .having(requests > 0)
+        .order_by(requests.desc())
+        .limit(limit)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+if __name__ == "__main__":
+    import app.db.model.client  # noqa: F401
+
+    asyncio.run(rebuild_usage_rollups())
+    print("Usage rollups rebuilt")
@@ -0,0 +1,59 @@
+import asyncio
+import importlib
+import time
+
+from app.db.base import async_session
+from app.services.catalog import catalog
+from app.utils.calculators import count_tokens
+from app.utils.knowledge_base import get_embeddings
+from app.utils.text_response import get_llm, get_prompt_template
+
+HEAVY_MODULES = (
+    "numpy",
+    "tiktoken",
+    "qrcode",
+    "pypdf",
+    "PyPDF2",
+    "weasyprint",
+    "langchain.prompts",
+    "langchain.text_splitter",
+    "langchain_chroma.vectorstores",
+    "langchain_google_genai",
+    "langchain_openai",
+)
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warm-up could not import {name}: {e}")
+
+
+def _init_providers():
+    get_prompt_template()
+    for model in catalog.models.values():
+        try:
+            count_tokens("warm-up", model.model_name)
+            get_embeddings(model.model_name)
+            if model.provider == "gemini":
+                get_llm(model.model_name)
+        except Exception as e:
+            print(f"Warm-up could not initialise {model.model_name}: {e}")
+
+
+async def warm_up():
+    started = time.perf_counter()
+
+    await asyncio.to_thread(_import_heavy_modules)
+
+    async with async_session() as session:
+        await catalog.ensure_fresh(session)
+
+    await asyncio.to_thread(_init_providers)
+
+    print(
+        f"Warm-up finished in {time.perf_counter() - started:.2f}s "
+        f"({len(catalog.models)} models)"
+    )
@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Any, Awaitable
+import asyncio
+import time
+
+from app.core.config import (
+    BREAKER_ERROR_RATE,
+    BREAKER_HALF_OPEN_CALLS,
+    BREAKER_MIN_CALLS,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_SLOW_RATE,
+    BREAKER_SLOW_SECONDS,
+    BREAKER_WINDOW,
+)
+from app.services import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over one upstream (a model or provider).
+
+    Opens when, over the last BREAKER_WINDOW calls, the error rate or the
+    share of calls slower than BREAKER_SLOW_SECONDS reaches its threshold.
+    After BREAKER_OPEN_SECONDS it lets BREAKER_HALF_OPEN_CALLS probes
+    through; one success closes it again, one failure reopens it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.calls: deque[tuple[bool, bool]] = deque(maxlen=BREAKER_WINDOW)
+        self.opened_at = 0.0
+        self.probes = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + BREAKER_OPEN_SECONDS - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == OPEN and not self.retry_after():
+            self.state = HALF_OPEN
+            self.probes = 0
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.probes < BREAKER_HALF_OPEN_CALLS:
+            self.probes += 1
+            return True
+        return False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        metrics.incr(f"breaker.{self.name}.opened")
+        print(f"Circuit breaker for {self.name} opened")
+
+    def record(self, ok: bool, seconds: float):
+        slow = seconds >= BREAKER_SLOW_SECONDS
+        if self.state == HALF_OPEN:
+            self.probes = max(0, self.probes - 1)
+            if ok and not slow:
+                self.state = CLOSED
+                self.calls.clear()
+                print(f"Circuit breaker for {self.name} closed")
+            else:
+                self._open()
+            return
+        if self.state == OPEN:
+            return
+
+        self.calls.append((ok, slow))
+        if len(self.calls) < BREAKER_MIN_CALLS:
+            return
+        errors = sum(1 for ok, _ in self.calls if not ok)
+        slow_calls = sum(1 for _, slow in self.calls if slow)
+        if (
+            errors / len(self.calls) >= BREAKER_ERROR_RATE
+            or slow_calls / len(self.calls) >= BREAKER_SLOW_RATE
+        ):
+            self._open()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "calls": len(self.calls),
+            "errors": sum(1 for ok, _ in self.calls if not ok),
+            "slow": sum(1 for _, slow in self.calls if slow),
+            "retry_after": self.retry_after() if self.state == OPEN else None,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+
+def breaker_states() -> dict:
+    return {name: breaker.snapshot() for name, breaker in sorted(_breakers.items())}
+
+
+async def guarded(name: str, call: Awaitable) -> Any:
+    """Await `call` through the `name` breaker, failing fast while it is open."""
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        if asyncio.iscoroutine(call):
+            call.close()
+        metrics.incr(f"breaker.{name}.rejected")
+        raise CircuitOpen(name, breaker.retry_after())
+
+    started = time.monotonic()
+    try:
+        result = await call
+    except asyncio.CancelledError:
+        # cancelado pelo prazo ou pelo hedge: só conta se já estava lento
+        elapsed = time.monotonic() - started
+        if elapsed >= BREAKER_SLOW_SECONDS:
+            breaker.record(False, elapsed)
+        elif breaker.state == HALF_OPEN:
+            breaker.probes = max(0, breaker.probes - 1)
+        raise
+    except Exception:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(True, time.monotonic() - started)
+    return result
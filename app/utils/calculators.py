@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.model.log import RequestLog, UploadLog
 from app.core.config import VALUE_PER_REQUEST
 from decimal import ROUND_HALF_UP
-import tiktoken
+from functools import lru_cache
 
 
 def calculate_openai_cost(
@@ -58,17 +58,45 @@ def calculate_total_upload_cost_gemini(
     return cost
 
 
+@lru_cache(maxsize=32)
+def get_encoding(model_name: str):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except Exception as e:
+        print(f"Tokenizer unavailable for {model_name}, estimating tokens: {e}")
+        return None
+
+
 def count_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
     try:
-        if "gemini" in model_name.lower:
+        if "gemini" in model_name.lower():
             return len(text) // 4
 
-        encoding = tiktoken.encoding_for_model(model_name)
-        return len(encoding(text))
+        encoding = get_encoding(model_name)
+        return len(encoding.encode(text))
     except Exception:
         return len(text.split()) * 1.3
 
 
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str) -> str:
+    if max_tokens <= 0:
+        return ""
+
+    try:
+        if "gemini" not in model_name.lower():
+            encoding = get_encoding(model_name)
+            return encoding.decode(encoding.encode(text)[:max_tokens])
+    except Exception:
+        pass
+
+    tokens = count_tokens(text, model_name)
+    if tokens <= max_tokens:
+        return text
+    return text[: int(len(text) * max_tokens / tokens)]
+
+
 async def calc_billing(client_id: str, session: AsyncSession):
     req_logs = (
         (
@@ -90,6 +118,10 @@ async def calc_billing(client_id: str, session: AsyncSession):
         .all()
     )
 
+    return billing_totals(req_logs, upload_logs)
+
+
+def billing_totals(req_logs, upload_logs) -> dict:
     req_cost = Decimal("0.00")
     total_reqs = Decimal("0.00")
     for log in req_logs:
@@ -0,0 +1,104 @@
+from itertools import repeat
+
+from app.core.config import (
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_PARALLEL_MIN_CHARS,
+    CHUNK_PROFILES,
+    CHUNK_TOKENS,
+)
+from app.services.catalog import model_provider
+from app.utils.calculators import count_tokens, truncate_to_tokens
+from app.utils.workers import get_process_pool
+
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def chunk_profile(model_name: str) -> tuple[int, int]:
+    profile = CHUNK_PROFILES.get(model_name) or CHUNK_PROFILES.get(
+        model_provider(model_name)
+    )
+    chunk_tokens, overlap_tokens = profile or (CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+    return int(chunk_tokens), min(int(overlap_tokens), int(chunk_tokens) // 2)
+
+
+def _hard_split(text: str, limit: int, model_name: str) -> list[str]:
+    pieces = []
+    while text:
+        piece = truncate_to_tokens(text, limit, model_name)
+        if not piece or not text.startswith(piece):
+            piece = text[: max(1, len(piece))]
+        pieces.append(piece)
+        text = text[len(piece) :]
+    return pieces
+
+
+def _split(text: str, limit: int, model_name: str, separators=SEPARATORS):
+    """Quebra `text` em pedaços de até `limit` tokens, mantendo os separadores."""
+    tokens = count_tokens(text, model_name)
+    if tokens <= limit:
+        return [(text, tokens)]
+    if not separators:
+        return [
+            (piece, count_tokens(piece, model_name))
+            for piece in _hard_split(text, limit, model_name)
+        ]
+
+    separator, rest = separators[0], separators[1:]
+    parts = text.split(separator)
+    pieces = []
+    for i, part in enumerate(parts):
+        if i < len(parts) - 1:
+            part += separator
+        if part:
+            pieces.extend(_split(part, limit, model_name, rest))
+    return pieces
+
+
+def chunk_text(
+    text: str, model_name: str, chunk_tokens: int, overlap_tokens: int
+) -> list[tuple[str, int, int]]:
+    """
+    Retorna [(texto, tokens, start_index)] com até `chunk_tokens` tokens por
+    chunk e até `overlap_tokens` tokens repetidos do chunk anterior.
+    """
+    chunks = []
+    window = []
+    window_tokens = 0
+    offset = 0
+
+    def flush():
+        content = "".join(piece for piece, _, _ in window)
+        if content.strip():
+            chunks.append((content, count_tokens(content, model_name), window[0][2]))
+
+    for piece, tokens in _split(text, chunk_tokens, model_name):
+        if window and window_tokens + tokens > chunk_tokens:
+            flush()
+            while window and (
+                window_tokens > overlap_tokens
+                or window_tokens + tokens > chunk_tokens
+            ):
+                window_tokens -= window.pop(0)[1]
+
+        window.append((piece, tokens, offset))
+        window_tokens += tokens
+        offset += len(piece)
+
+    if window:
+        flush()
+    return chunks
+
+
+def chunk_texts(
+    texts: list[str], model_name: str, parallel: bool | None = None
+) -> list[list[tuple[str, int, int]]]:
+    chunk_tokens, overlap_tokens = chunk_profile(model_name)
+    if parallel is None:
+        parallel = (
+            len(texts) > 1 and sum(map(len, texts)) >= CHUNK_PARALLEL_MIN_CHARS
+        )
+
+    args = (repeat(model_name), repeat(chunk_tokens), repeat(overlap_tokens))
+    if parallel:
+        return list(get_process_pool().map(chunk_text, texts, *args))
+    return list(map(chunk_text, texts, *args))
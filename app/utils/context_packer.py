@@ -0,0 +1,85 @@
+from app.core.config import (
+    CONTEXT_BUDGET_RATIO,
+    CONTEXT_DEFAULT_TOKEN_LIMIT,
+    CONTEXT_MIN_CHUNK_TOKENS,
+)
+from app.utils.calculators import count_tokens, truncate_to_tokens
+
+MIN_OVERLAP_CHARS = 50
+NEAR_DUPLICATE_RATIO = 0.8
+SHINGLE_WORDS = 8
+
+
+def context_budget(token_limit: int | None, reserved_tokens: int = 0) -> int:
+    limit = token_limit or CONTEXT_DEFAULT_TOKEN_LIMIT
+    return max(0, int(limit * CONTEXT_BUDGET_RATIO) - reserved_tokens)
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = text.split()
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)}
+    return {
+        tuple(words[i : i + SHINGLE_WORDS])
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def _strip_overlap(text: str, selected: str) -> str:
+    """Drop the part of `text` the splitter already copied into `selected`."""
+    head = text[:MIN_OVERLAP_CHARS]
+    index = selected.find(head)
+    if index >= 0 and text.startswith(selected[index:]):
+        text = text[len(selected) - index :]
+
+    tail = text[-MIN_OVERLAP_CHARS:]
+    index = selected.find(tail)
+    if index >= 0 and text.endswith(selected[: index + len(tail)]):
+        text = text[: len(text) - index - len(tail)]
+
+    return text
+
+
+def pack_context(results, model_name: str, budget: int) -> dict:
+    """
+    results: [(Document, score)] ordenados por relevância
+    budget: tokens disponíveis para o contexto
+    """
+    texts = []
+    shingles = []
+    packed_tokens = 0
+    dropped = 0
+
+    for doc, _ in results:
+        text = doc.page_content
+        if len(text) >= MIN_OVERLAP_CHARS:
+            for selected in texts:
+                text = _strip_overlap(text, selected)
+        text = text.strip()
+
+        doc_shingles = _shingles(text)
+        if not text or any(
+            len(doc_shingles & other) >= NEAR_DUPLICATE_RATIO * len(doc_shingles)
+            for other in shingles
+        ):
+            dropped += 1
+            continue
+
+        remaining = budget - packed_tokens
+        tokens = count_tokens(text, model_name)
+        if tokens > remaining:
+            if remaining < CONTEXT_MIN_CHUNK_TOKENS:
+                break
+            text = truncate_to_tokens(text, remaining, model_name)
+            tokens = count_tokens(text, model_name)
+
+        texts.append(text)
+        shingles.append(doc_shingles)
+        packed_tokens += tokens
+
+    return {
+        "texts": texts,
+        "tokens": int(packed_tokens),
+        "budget": budget,
+        "dropped": dropped,
+    }
@@ -0,0 +1,57 @@
+from contextlib import suppress
+import asyncio
+import time
+
+from fastapi import Request
+
+from app.core.config import DISCONNECT_POLL_INTERVAL
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class Deadline:
+    """Absolute time budget for one request, shared by every stage it runs."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    async def run(self, awaitable, stage: str):
+        remaining = self.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(stage)
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage)
+
+
+async def cancel_on_disconnect(request: Request, coroutine):
+    """Run `coroutine`, cancelling it if the HTTP client goes away first."""
+    task = asyncio.ensure_future(coroutine)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -1,10 +1,12 @@
 from jinja2 import Template
-from weasyprint import HTML
-from app.core.config import CHAVE_PIX, CIDADE_PIX
+from app.core.config import CHAVE_PIX, CIDADE_PIX, PIX_CACHE_SIZE
+from app.utils.workers import run_in_process
+from collections import OrderedDict
+from functools import lru_cache
 from io import BytesIO
+import os
 import secrets
 import hashlib
-import qrcode
 
 
 def generate_pay_hash(length: int = 32) -> str:
@@ -19,32 +21,89 @@ def hash_admin_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
 
+_qrcode_cache: OrderedDict[str, bytes] = OrderedDict()
+
+
 def generate_qrcode_pix(
     client_id: str, name: str, amount_due: float, description: str = ""
 ):
     payload = generate_payload_pix(amount_due, name, description)
+
+    png = _qrcode_cache.get(payload)
+    if png is None:
+        png = render_qrcode_png(payload)
+        _cache_qrcode(payload, png)
+
+    return payload, BytesIO(png)
+
+
+async def generate_qrcode_pix_async(
+    client_id: str, name: str, amount_due: float, description: str = ""
+):
+    payload = generate_payload_pix(amount_due, name, description)
+
+    png = _qrcode_cache.get(payload)
+    if png is None:
+        png = await run_in_process(render_qrcode_png, payload)
+        _cache_qrcode(payload, png)
+
+    return payload, BytesIO(png)
+
+
+def render_qrcode_png(payload: str) -> bytes:
     buffer = BytesIO()
+    import qrcode
+
     img = qrcode.make(payload)
     img.save(buffer, format="PNG")
-    buffer.seek(0)
+    return buffer.getvalue()
 
-    return payload, buffer
 
+def _cache_qrcode(payload: str, png: bytes):
+    _qrcode_cache[payload] = png
+    _qrcode_cache.move_to_end(payload)
+    while len(_qrcode_cache) > PIX_CACHE_SIZE:
+        _qrcode_cache.popitem(last=False)
 
-def crc16(data: bytes) -> str:
-    crc = 0xFFFF
-    for b in data:
-        crc ^= b << 8
+
+def clear_pix_cache():
+    _build_payload_pix.cache_clear()
+    _qrcode_cache.clear()
+
+
+def _make_crc16_table() -> list[int]:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
         for _ in range(8):
             if (crc & 0x8000) != 0:
                 crc = (crc << 1) ^ 0x1021
             else:
                 crc <<= 1
             crc &= 0xFFFF
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE = _make_crc16_table()
+
+
+def crc16(data: bytes) -> str:
+    crc = 0xFFFF
+    table = _CRC16_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ b]
     return f"{crc:04X}"
 
 
 def generate_payload_pix(amount_due: float, name: str, description: str = "") -> str:
+    return _build_payload_pix(CHAVE_PIX, CIDADE_PIX, amount_due, name, description)
+
+
+@lru_cache(maxsize=PIX_CACHE_SIZE)
+def _build_payload_pix(
+    chave_pix: str, cidade_pix: str, amount_due: float, name: str, description: str
+) -> str:
     payload = ""
     amount_due = 2.0
 
@@ -53,7 +112,7 @@ def generate_payload_pix(amount_due: float, name: str, description: str = "") ->
     payload += "010211"
 
     gui = "br.gov.bcb.pix"
-    conta = f"0014{gui}01{len(CHAVE_PIX):02}{CHAVE_PIX}"
+    conta = f"0014{gui}01{len(chave_pix):02}{chave_pix}"
     if description:
         conta += f"02{len(description):02}{description}"
     payload += f"26{len(conta):02}{conta}"
@@ -65,7 +124,7 @@ def generate_payload_pix(amount_due: float, name: str, description: str = "") ->
 
     payload += "5802BR"
     payload += f"59{len(name):02}{name}"
-    payload += f"60{len(CIDADE_PIX):02}{CIDADE_PIX}"
+    payload += f"60{len(cidade_pix):02}{cidade_pix}"
 
     add_data = "05" + f"{len('***'):02}***"
     payload += f"62{len(add_data):02}{add_data}"
@@ -77,9 +136,22 @@ def generate_payload_pix(amount_due: float, name: str, description: str = "") ->
 
 
 def generate_receipt_pdf(html_template: str, context: dict, output_path: str):
+    from weasyprint import HTML
+
     template = Template(html_template)
     rendered_html = template.render(context)
 
     pdf_bytes = HTML(string=rendered_html).write_pdf()
 
     return pdf_bytes
+
+
+def write_receipt_pdf(html_template: str, context: dict, output_path: str) -> str:
+    pdf_bytes = generate_receipt_pdf(html_template, context, output_path)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, output_path)
+
+    return output_path
@@ -0,0 +1,108 @@
+from collections import deque
+from typing import Any, Awaitable, Callable
+import asyncio
+import time
+
+from app.core.config import (
+    HEDGE_LLM,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MODELS,
+    HEDGE_PERCENTILE,
+    HEDGE_WINDOW,
+)
+from app.services import metrics
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies for one model."""
+
+    def __init__(self, size: int):
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def expected_beyond(self, elapsed: float) -> float:
+        """Média das latências maiores que `elapsed` (ou o próprio `elapsed`)."""
+        tail = [sample for sample in self.samples if sample > elapsed]
+        return sum(tail) / len(tail) if tail else elapsed
+
+
+_trackers: dict[str, LatencyTracker] = {}
+
+
+def _tracker(model_name: str) -> LatencyTracker:
+    if model_name not in _trackers:
+        _trackers[model_name] = LatencyTracker(HEDGE_WINDOW)
+    return _trackers[model_name]
+
+
+def hedge_delay(model_name: str) -> float | None:
+    """How long to wait for `model_name` before sending a second request."""
+    delay = _tracker(model_name).percentile(HEDGE_PERCENTILE)
+    return None if delay is None else max(delay, HEDGE_MIN_DELAY)
+
+
+async def _timed(call: Awaitable) -> tuple[Any, float]:
+    started = time.perf_counter()
+    result = await call
+    return result, time.perf_counter() - started
+
+
+async def hedged_call(model_name: str, call: Callable[[str], Awaitable]) -> Any:
+    """
+    Await call(model_name); when HEDGE_LLM is on and it is slower than the
+    model's rolling HEDGE_PERCENTILE latency, also start call(alternate)
+    (HEDGE_MODELS, or the same model) and keep whichever succeeds first.
+    The other request is cancelled.
+    """
+    metrics.incr("llm.calls")
+    started = time.perf_counter()
+    delay = hedge_delay(model_name) if HEDGE_LLM else None
+
+    primary = asyncio.create_task(_timed(call(model_name)))
+    tasks = {primary: model_name}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                hedge_model = HEDGE_MODELS.get(model_name, model_name)
+                metrics.incr("llm.hedged")
+                tasks[asyncio.create_task(_timed(call(hedge_model)))] = hedge_model
+
+        pending = set(tasks)
+        errors = []
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    continue
+
+                result, latency = task.result()
+                _tracker(tasks[task]).record(latency)
+                elapsed = time.perf_counter() - started
+                metrics.incr("llm.latency_ms", elapsed * 1000)
+                if task is not primary:
+                    # o primário foi cancelado: estima quanto ele ainda levaria
+                    expected = _tracker(model_name).expected_beyond(elapsed)
+                    metrics.incr("llm.hedge_wins")
+                    metrics.incr("llm.hedge_saved_ms", (expected - elapsed) * 1000)
+                    if not primary.done():
+                        # registra o tempo (censurado) do primário; sem ele a
+                        # janela perde a cauda e o atraso do hedge só diminui
+                        _tracker(model_name).record(elapsed)
+                return result
+        raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
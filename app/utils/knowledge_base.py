@@ -1,25 +1,81 @@
-from pypdf import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
-from langchain.schema import Document
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from io import BytesIO
+from app.core.config import (
+    VECTOR_BACKEND,
+    VECTOR_DIMENSIONS,
+    VECTOR_DTYPE,
+    VECTOR_LAYOUT,
+    VECTOR_RESCORE,
+    VECTOR_SHARDS,
+    VECTOR_STORE_CACHE_SIZE,
+)
+import fcntl
 import os
+import shutil
+import threading
 
 load_dotenv()
 
 VECTOR_DIR = "vectorstores"
+SHARED_DIR = f"{VECTOR_DIR}/shared"
+
+EMBEDDING_PROVIDERS = ("gemini", "openai")
+
+_store_cache: OrderedDict[tuple[str, str], tuple[int, object]] = OrderedDict()
+# usado por threads (asyncio.to_thread) e pelo loop ao mesmo tempo
+_store_cache_lock = threading.Lock()
+
+
+def embeddings_provider(model_type: str) -> str | None:
+    if model_type.startswith("gemini-"):
+        return "gemini"
+    elif model_type.startswith("gpt-"):
+        return "openai"
+    return None
+
+
+@lru_cache(maxsize=None)
+def _embeddings(provider: str):
+    if provider == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model="text-embedding-3-small")
+
+
+def get_embeddings(model_type: str):
+    provider = embeddings_provider(model_type)
+    if provider is None:
+        return None
+    return _embeddings(provider)
+
+
+async def aembed_queries(model_type: str, texts: list[str]) -> list[list[float]]:
+    """Embed several search queries in as few provider calls as possible."""
+    embeddings = get_embeddings(model_type)
+    if len(texts) == 1:
+        return [await embeddings.aembed_query(texts[0])]
+    if embeddings_provider(model_type) == "gemini":
+        return await embeddings.aembed_documents(texts, task_type="RETRIEVAL_QUERY")
+    return await embeddings.aembed_documents(texts)
 
 
 def create_db(client_id: str, model_type: str, pdf_bytes_list: list[bytes]):
     documents = load_documents_from_bytes(pdf_bytes_list)
-    chunks = splitter_chunks(documents)
+    chunks = splitter_chunks(documents, model_type)
     return vetorize_chunks(chunks, client_id, model_type)
 
 
 def load_documents_from_bytes(pdf_bytes_list: list[bytes]):
+    from pypdf import PdfReader
+    from langchain.schema import Document
+
     documents = []
     for pdf_bytes in pdf_bytes_list:
         reader = PdfReader(BytesIO(pdf_bytes))
@@ -30,25 +86,118 @@ def load_documents_from_bytes(pdf_bytes_list: list[bytes]):
     return documents
 
 
-def splitter_chunks(documents):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000, chunk_overlap=500, length_function=len, add_start_index=True
-    )
-    return splitter.split_documents(documents)
+def splitter_chunks(documents, model_type: str):
+    from langchain.schema import Document
+    from app.utils.chunking import chunk_texts
+
+    texts = [doc.page_content for doc in documents]
+    chunks = []
+    for doc, doc_chunks in zip(documents, chunk_texts(texts, model_type)):
+        for text, tokens, start_index in doc_chunks:
+            metadata = {**doc.metadata, "start_index": start_index, "tokens": tokens}
+            chunks.append(Document(page_content=text, metadata=metadata))
+    return chunks
+
+
+def chunk_tokens(chunks) -> int:
+    return int(sum(chunk.metadata["tokens"] for chunk in chunks))
+
+
+def shard_dir(client_id, provider: str) -> str:
+    # um shard por provedor: as dimensões dos embeddings não se misturam
+    return f"{SHARED_DIR}/{provider}/{int(client_id) % VECTOR_SHARDS:03d}"
+
+
+def client_store_dir(client_id, model_type: str) -> str:
+    if VECTOR_LAYOUT == "shared":
+        return shard_dir(client_id, embeddings_provider(model_type))
+    return f"{VECTOR_DIR}/{client_id}"
+
+
+@contextmanager
+def store_lock(persist_dir: str):
+    """Serializa escritas num diretório de índice entre processos."""
+    os.makedirs(os.path.dirname(persist_dir) or ".", exist_ok=True)
+    with open(f"{persist_dir}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TenantStore:
+    """One client's rows of a shared vector store."""
+
+    def __init__(self, db, client_id):
+        self.db = db
+        self.client_id = int(client_id)
+        self.filter = {"client_id": self.client_id}
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4):
+        return self.db.similarity_search_with_relevance_scores(
+            query, k=k, filter=self.filter
+        )
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: list[float], k: int = 4
+    ):
+        return self.db.similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=self.filter
+        )
+
+    def similarity_search(self, query: str, k: int = 4):
+        return self.db.similarity_search(query, k=k, filter=self.filter)
+
+
+def search_by_vector(db, embedding: list[float], k: int) -> list:
+    """
+    (documento, relevância 0-1, maior = mais parecido). A busca por vetor do
+    Chroma devolve a distância bruta; a do NumpyVectorStore já a relevância.
+    """
+    from app.utils.vector_index import NumpyVectorStore
+
+    results = db.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+    store = db.db if isinstance(db, TenantStore) else db
+    if isinstance(store, NumpyVectorStore):
+        return results
+    relevance = store._select_relevance_score_fn()
+    return [(doc, relevance(distance)) for doc, distance in results]
 
 
 def vetorize_chunks(chunks, client_id: str, model_type: str):
-    if model_type.startswith("gemini-"):
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    elif model_type.startswith("gpt-"):
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    else:
+    from app.utils.vector_index import NumpyVectorStore
+
+    embeddings = get_embeddings(model_type)
+    if embeddings is None:
         return None
 
+    shared = VECTOR_LAYOUT == "shared"
+    if shared:
+        for chunk in chunks:
+            chunk.metadata["client_id"] = int(client_id)
+
     try:
-        persist_dir = f"{VECTOR_DIR}/{client_id}"
-        db = Chroma.from_documents(chunks, embeddings, persist_directory=persist_dir)
+        persist_dir = client_store_dir(client_id, model_type)
+        with store_lock(persist_dir):
+            if VECTOR_BACKEND == "numpy" or NumpyVectorStore.exists(persist_dir):
+                db = NumpyVectorStore.from_documents(
+                    chunks,
+                    embeddings,
+                    persist_dir,
+                    dtype=VECTOR_DTYPE,
+                    dimensions=VECTOR_DIMENSIONS,
+                    rescore=VECTOR_RESCORE,
+                    tenant=int(client_id) if shared else None,
+                )
+            else:
+                from langchain_chroma.vectorstores import Chroma
 
+                db = Chroma.from_documents(
+                    chunks, embeddings, persist_directory=persist_dir
+                )
+
+        invalidate_client_db(client_id)
         print(f"Database created for client {client_id} at {persist_dir}")
         return db
     except Exception as e:
@@ -56,29 +205,134 @@ def vetorize_chunks(chunks, client_id: str, model_type: str):
         return None
 
 
-def get_client_db(client_id: str, model_type: str):
+def delete_client_db(client_id: str):
+    from app.utils.vector_index import NumpyVectorStore
+
+    for provider in EMBEDDING_PROVIDERS:
+        persist_dir = shard_dir(client_id, provider)
+        if not os.path.exists(persist_dir):
+            continue
+        with store_lock(persist_dir):
+            if NumpyVectorStore.exists(persist_dir):
+                NumpyVectorStore(persist_dir, None).delete_tenant(client_id)
+            else:
+                from langchain_chroma.vectorstores import Chroma
+
+                Chroma(persist_directory=persist_dir).delete(
+                    where={"client_id": int(client_id)}
+                )
+
     persist_dir = f"{VECTOR_DIR}/{client_id}"
+    if os.path.exists(persist_dir):
+        shutil.rmtree(persist_dir)
+    invalidate_client_db(client_id)
+
+
+def _store_signature(persist_dir: str) -> int:
+    with os.scandir(persist_dir) as entries:
+        return max((entry.stat().st_mtime_ns for entry in entries), default=0)
+
+
+def _store_count(db, client_id=None) -> int:
+    from app.utils.vector_index import NumpyVectorStore
+
+    if isinstance(db, NumpyVectorStore):
+        return db.count(client_id)
+    if client_id is None:
+        return db._collection.count()
+    return len(db.get(where={"client_id": int(client_id)}, limit=1)["ids"])
+
+
+def store_cache_key(client_id: str, model_type: str) -> tuple[str, str]:
+    return (client_store_dir(client_id, model_type), embeddings_provider(model_type))
+
+
+def store_footprint(client_id: str, model_type: str) -> int:
+    """Bytes the store serving `client_id` takes in memory once searched."""
+    from app.utils.vector_index import NumpyVectorStore
+
+    persist_dir = client_store_dir(client_id, model_type)
+    if NumpyVectorStore.exists(persist_dir):
+        return NumpyVectorStore(persist_dir, None).footprint()
+
+    total = 0
+    for root, _, files in os.walk(persist_dir):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def preload_client_db(client_id: str, model_type: str) -> bool:
+    """Open the client's store and fault its index into memory."""
+    from app.utils.vector_index import NumpyVectorStore
+
+    db = get_client_db(client_id, model_type)
+    if db is None:
+        return False
+    if isinstance(db, TenantStore):
+        db = db.db
+
+    if isinstance(db, NumpyVectorStore):
+        db.preload()
+    else:
+        sample = db._collection.peek(1)
+        if len(sample["embeddings"]):
+            db._collection.query(query_embeddings=sample["embeddings"][:1], n_results=1)
+    return True
+
+
+def invalidate_client_db(client_id: str):
+    stale = {f"{VECTOR_DIR}/{client_id}"}
+    stale.update(shard_dir(client_id, provider) for provider in EMBEDDING_PROVIDERS)
+    with _store_cache_lock:
+        for key in [key for key in _store_cache if key[0] in stale]:
+            del _store_cache[key]
+
+
+def get_client_db(client_id: str, model_type: str):
+    persist_dir = client_store_dir(client_id, model_type)
+    tenant = int(client_id) if VECTOR_LAYOUT == "shared" else None
 
     if not os.path.exists(persist_dir):
         print(f"Knowledgebase for client {client_id} not found.")
         return None
 
-    if model_type.startswith("gemini-"):
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    elif model_type.startswith("gpt-"):
-        embeddings = OpenAIEmbeddings("text-embedding-3-small")
-    else:
+    embeddings = get_embeddings(model_type)
+    if embeddings is None:
         return None
 
+    key = store_cache_key(client_id, model_type)
+    signature = _store_signature(persist_dir)
+    with _store_cache_lock:
+        cached = _store_cache.get(key)
+        if cached and cached[0] == signature:
+            _store_cache.move_to_end(key)
+
     try:
-        db = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+        if cached and cached[0] == signature:
+            db = cached[1]
+        else:
+            from app.utils.vector_index import NumpyVectorStore
 
-        if not db._collection.count():
+            if NumpyVectorStore.exists(persist_dir):
+                db = NumpyVectorStore(persist_dir, embeddings)
+            else:
+                from langchain_chroma.vectorstores import Chroma
+
+                db = Chroma(
+                    persist_directory=persist_dir, embedding_function=embeddings
+                )
+
+            with _store_cache_lock:
+                _store_cache[key] = (signature, db)
+                while len(_store_cache) > VECTOR_STORE_CACHE_SIZE:
+                    _store_cache.popitem(last=False)
+            print(f"Vector store loaded from {persist_dir}.")
+
+        if not _store_count(db, tenant):
             print(f"Knowledgebase for client {client_id} is empty.")
             return None
 
-        print(f"Knowledgebase loaded for client {client_id}.")
-        return db
+        return db if tenant is None else TenantStore(db, tenant)
 
     except Exception as e:
         print(f"Error loading DB for client {client_id}: {e}")
@@ -1,9 +1,26 @@
-from langchain.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from fastapi import status, HTTPException
-from app.utils.knowledge_base import get_client_db
-from app.utils.calculators import count_tokens
-from typing import Any, Dict
+from app.utils.knowledge_base import (
+    aembed_queries,
+    embeddings_provider,
+    get_client_db,
+    search_by_vector,
+)
+from app.utils.calculators import count_tokens, truncate_to_tokens
+from app.utils.context_packer import context_budget, pack_context
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.hedging import hedged_call
+from app.utils.breaker import CircuitOpen, guarded
+from app.services import metrics
+from app.core.config import (
+    CONTEXT_CANDIDATES,
+    CONVERSATION_SUMMARY_TOKENS,
+    LLM_FALLBACKS,
+    MIN_RELEVANCE_SCORE,
+    NO_ANSWER_RESPONSE,
+    REQUEST_TIMEOUT,
+)
+from typing import Any, Dict, Optional
+from functools import lru_cache
+import asyncio
 
 
 template_prompt = """
@@ -11,49 +28,262 @@ template_prompt = """
     Somente com base nessas informações : {knowledge_base}.
     """
 
+conversation_prompt = """
+    Resumo da conversa até aqui: {summary}
+    Últimas mensagens:
+    {history}
+    Responda a nova pergunta do usúario: {question}.
+    Somente com base nessas informações e na conversa : {knowledge_base}.
+    """
+
+summary_prompt = """
+    Atualize o resumo de uma conversa com as novas mensagens, em no máximo
+    {max_words} palavras, mantendo fatos, nomes e números citados.
+    Resumo atual: {summary}
+    Novas mensagens:
+    {history}
+    """
+
+
+@lru_cache(maxsize=32)
+def get_llm(model_name: str):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=model_name)
+
+
+async def call_llm(model_name: str, prompt):
+    """LLM call behind the model's circuit breaker, using LLM_FALLBACKS if open."""
+    try:
+        return await guarded(model_name, get_llm(model_name).ainvoke(prompt))
+    except CircuitOpen:
+        fallback = LLM_FALLBACKS.get(model_name)
+        if not fallback:
+            raise
+        metrics.incr("llm.fallbacks")
+        return await guarded(fallback, get_llm(fallback).ainvoke(prompt))
+
+
+@lru_cache(maxsize=2)
+def get_prompt_template(conversation: bool = False):
+    from langchain.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_template(
+        conversation_prompt if conversation else template_prompt
+    )
+
+
+def empty_usage() -> Dict[str, Any]:
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "context_tokens": 0,
+        "context_chunks": 0,
+    }
 
-def question(
+
+async def open_client_db(client_id: str, model_name: str, deadline: Deadline):
+    return await deadline.run(
+        asyncio.to_thread(get_client_db, client_id, model_name), "retrieval"
+    )
+
+
+async def embed_questions(
+    model_name: str, questions: list[str], deadline: Deadline
+) -> list[list[float]]:
+    return await deadline.run(
+        guarded(
+            f"embeddings:{embeddings_provider(model_name)}",
+            aembed_queries(model_name, questions),
+        ),
+        "embedding",
+    )
+
+
+async def search(db, vectors: list[list[float]], deadline: Deadline) -> list[list]:
+    def run():
+        return [search_by_vector(db, vector, CONTEXT_CANDIDATES) for vector in vectors]
+
+    return await deadline.run(asyncio.to_thread(run), "retrieval")
+
+
+async def retrieve(
+    client_id: str, questions: list[str], model_name: str, deadline: Deadline
+) -> list[list]:
+    """Um único acesso à base do cliente para todas as perguntas."""
+    db = await open_client_db(client_id, model_name, deadline)
+    if db is None:
+        return [[] for _ in questions]
+
+    vectors = await embed_questions(model_name, questions, deadline)
+    return await search(db, vectors, deadline)
+
+
+async def answer(
     client_id: str,
     user_question: str,
     model_name: str,
+    results: list,
+    token_limit: Optional[int],
+    min_relevance: Optional[float],
+    deadline: Deadline,
+    usage: Dict[str, Any],
+    conversation: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
-    db = get_client_db(client_id, model_name)
-
-    results = db.similarity_search_with_relevance_scores(user_question, k=3)
+    """conversation: {"summary", "history"} de uma sessão, quando houver"""
+    if min_relevance is None:
+        min_relevance = MIN_RELEVANCE_SCORE
+    results = [(doc, score) for doc, score in results if score >= min_relevance]
 
     if not results:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Low relevance score: {results[0][1]}",
-        )
+        return no_answer(client_id, model_name)
 
-    result_texts = [doc.page_content for doc, score in results]
-    knowledge_base = "\n\n----\n\n".join(result_texts)
-
-    prompt_template = ChatPromptTemplate.from_template(template_prompt)
-    prompt = prompt_template.invoke(
-        {"question": user_question, "knowledge_base": knowledge_base}
+    values = {"question": user_question, **(conversation or {})}
+    template = conversation_prompt if conversation else template_prompt
+    reserved_tokens = count_tokens(template + "".join(values.values()), model_name)
+    context = pack_context(
+        results, model_name, context_budget(token_limit, reserved_tokens)
     )
+    knowledge_base = "\n\n----\n\n".join(context["texts"])
 
+    prompt = get_prompt_template(bool(conversation)).invoke(
+        {**values, "knowledge_base": knowledge_base}
+    )
     prompt_text = (
         str(prompt.to_string()) if hasattr(prompt, "to_string") else str(prompt)
     )
     input_tokens = count_tokens(prompt_text, model_name)
+    usage.update(
+        input_tokens=input_tokens,
+        total_tokens=input_tokens,
+        context_tokens=context["tokens"],
+        context_chunks=len(context["texts"]),
+    )
 
-    llm = ChatGoogleGenerativeAI(model=model_name)
-    response = llm.invoke(prompt)
+    response = await deadline.run(
+        hedged_call(model_name, lambda model: call_llm(model, prompt)), "llm"
+    )
     text_response = response.content
 
     output_tokens = count_tokens(text_response, model_name)
-    total_tokens = input_tokens + output_tokens
+    usage.update(output_tokens=output_tokens, total_tokens=input_tokens + output_tokens)
 
     return {
         "response": text_response,
-        "usage": {
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": total_tokens,
-        },
+        "usage": usage,
+        "model": model_name,
+        "client_id": client_id,
+        "answered": True,
+    }
+
+
+async def question(
+    client_id: str,
+    user_question: str,
+    model_name: str,
+    token_limit: Optional[int] = None,
+    min_relevance: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+    usage: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    deadline: orçamento de tempo compartilhado por embedding, busca e LLM
+    usage: preenchido à medida que as etapas cobráveis começam, para que o
+    chamador registre o consumo parcial se a requisição for cancelada
+    """
+    deadline = deadline or Deadline(REQUEST_TIMEOUT)
+    usage = empty_usage() if usage is None else usage
+
+    (results,) = await retrieve(client_id, [user_question], model_name, deadline)
+    return await answer(
+        client_id,
+        user_question,
+        model_name,
+        results,
+        token_limit,
+        min_relevance,
+        deadline,
+        usage,
+    )
+
+
+async def question_batch(
+    client_id: str,
+    questions: list[str],
+    model_name: str,
+    token_limit: Optional[int],
+    min_relevance: Optional[float],
+    deadline: Deadline,
+    usages: list[Dict[str, Any]],
+    concurrency: int,
+) -> list[Dict[str, Any]]:
+    """
+    Responde várias perguntas com uma única busca na base do cliente.
+    Falhas de um item viram {"error": ...} sem derrubar os demais.
+    """
+    retrievals = await retrieve(client_id, questions, model_name, deadline)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await answer(
+                    client_id,
+                    questions[index],
+                    model_name,
+                    retrievals[index],
+                    token_limit,
+                    min_relevance,
+                    deadline,
+                    usages[index],
+                )
+            except DeadlineExceeded as e:
+                return {"error": str(e), "reason": "deadline", "usage": usages[index]}
+            except CircuitOpen as e:
+                usages[index].update(empty_usage())
+                return {
+                    "error": str(e),
+                    "reason": "unavailable",
+                    "usage": usages[index],
+                }
+            except Exception as e:
+                print(f"Batch item {index} failed for client {client_id}: {e}")
+                return {
+                    "error": "Upstream error",
+                    "reason": "error",
+                    "usage": usages[index],
+                }
+
+    return await asyncio.gather(*(run(index) for index in range(len(questions))))
+
+
+async def summarize(
+    summary: Optional[str], history: str, model_name: str, usage: Dict[str, Any]
+) -> str:
+    """Incorpora `history` ao resumo, limitado a CONVERSATION_SUMMARY_TOKENS."""
+    prompt = summary_prompt.format(
+        max_words=CONVERSATION_SUMMARY_TOKENS * 3 // 4,
+        summary=summary or "-",
+        history=history,
+    )
+    input_tokens = count_tokens(prompt, model_name)
+    usage.update(input_tokens=input_tokens, total_tokens=input_tokens)
+
+    response = await call_llm(model_name, prompt)
+
+    output_tokens = count_tokens(response.content, model_name)
+    usage.update(output_tokens=output_tokens, total_tokens=input_tokens + output_tokens)
+    return truncate_to_tokens(
+        response.content, CONVERSATION_SUMMARY_TOKENS, model_name
+    )
+
+
+def no_answer(client_id: str, model_name: str) -> Dict[str, Any]:
+    return {
+        "response": NO_ANSWER_RESPONSE,
+        "usage": empty_usage(),
         "model": model_name,
         "client_id": client_id,
+        "answered": False,
     }
@@ -0,0 +1,339 @@
+from langchain.schema import Document
+import numpy as np
+import json
+import math
+import os
+
+from app.core.config import VECTOR_RESCORE_FACTOR
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+RESCORE_FILE = "rescore.npy"
+TENANTS_FILE = "tenants.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+ARRAY_FILES = (SCALES_FILE, RESCORE_FILE, TENANTS_FILE, VECTORS_FILE)
+SCORE_BLOCK_ROWS = 4096
+COMPACT_DTYPES = ("float32", "float16", "int8")
+
+
+class NumpyVectorStore:
+    """Exact cosine search over a memory-mapped matrix of normalized embeddings.
+
+    Texts and metadata live in a JSON-lines sidecar read only for top-k rows.
+    The matrix may be stored compactly (float16, or int8 with a per-row
+    scale, optionally truncated to fewer dimensions); the top candidates
+    are then rescored against a full-dimension float16 copy kept on disk.
+    A store shared by several clients keeps each row's client id in
+    tenants.npy and searches are restricted with filter={"client_id": ...}.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.vectors = np.load(self._path(VECTORS_FILE), mmap_mode="r")
+        self.scales = self._load(SCALES_FILE)
+        self.rescore = self._load(RESCORE_FILE, mmap_mode="r")
+        self.tenants = self._load(TENANTS_FILE)
+        self._tenant_rows = {}
+        self._offsets = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def _load(self, name: str, mmap_mode=None):
+        if not os.path.exists(self._path(name)):
+            return None
+        return np.load(self._path(name), mmap_mode=mmap_mode)
+
+    @staticmethod
+    def exists(persist_directory: str) -> bool:
+        return os.path.exists(os.path.join(persist_directory, VECTORS_FILE))
+
+    @property
+    def dtype(self) -> str:
+        return str(self.vectors.dtype)
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    def full_vectors(self) -> np.ndarray:
+        """Best available float32 copy of every stored embedding."""
+        if self.rescore is not None:
+            return np.asarray(self.rescore, dtype=np.float32)
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        if self.scales is not None:
+            vectors = vectors * self.scales[:, None]
+        return vectors
+
+    def records(self) -> list[dict]:
+        with open(self._path(DOCUMENTS_FILE)) as f:
+            return [json.loads(line) for line in f]
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: list[Document],
+        embedding,
+        persist_directory: str,
+        dtype: str = "float32",
+        dimensions: int = 0,
+        rescore: bool = True,
+        tenant: int | None = None,
+    ):
+        vectors = np.asarray(
+            embedding.embed_documents([doc.page_content for doc in documents]),
+            dtype=np.float32,
+        )
+        records = [
+            {"page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in documents
+        ]
+        tenants = None
+        if tenant is not None:
+            tenants = np.full(len(documents), int(tenant), dtype=np.int64)
+        cls.write(
+            persist_directory, vectors, records, dtype, dimensions, rescore, tenants
+        )
+        return cls(persist_directory, embedding)
+
+    @classmethod
+    def write(
+        cls,
+        persist_directory: str,
+        vectors: np.ndarray,
+        records: list[dict] | None = None,
+        dtype: str = "float32",
+        dimensions: int = 0,
+        rescore: bool = True,
+        tenants: np.ndarray | None = None,
+        append: bool = True,
+    ):
+        """
+        Grava `vectors` (float32, dimensão completa) no formato pedido.
+        Ao anexar a um índice existente, o formato dele prevalece.
+        `records=None` mantém o arquivo de documentos como está.
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        os.makedirs(persist_directory, exist_ok=True)
+
+        existing = None
+        if append and cls.exists(persist_directory):
+            existing = cls(persist_directory, None)
+            dtype, dimensions = existing.dtype, existing.dimensions
+            rescore = existing.rescore is not None
+            if (existing.tenants is None) != (tenants is None):
+                raise ValueError("Cannot mix shared and single-client rows")
+
+        if dimensions >= vectors.shape[1]:
+            dimensions = 0
+        compact, scales = quantize(vectors, dtype, dimensions)
+        arrays = {
+            VECTORS_FILE: compact,
+            SCALES_FILE: scales,
+            RESCORE_FILE: None,
+            TENANTS_FILE: tenants,
+        }
+        if rescore and (dtype == "int8" or dimensions):
+            arrays[RESCORE_FILE] = vectors.astype(np.float16)
+
+        if existing is not None:
+            arrays = {
+                name: None
+                if array is None
+                else np.concatenate([existing._load(name), array])
+                for name, array in arrays.items()
+            }
+
+        _save(persist_directory, arrays, records, append=existing is not None)
+
+    def delete_tenant(self, tenant: int) -> int:
+        if self.tenants is None:
+            return 0
+        keep = self.tenants != int(tenant)
+        removed = int(len(keep) - keep.sum())
+        if not removed:
+            return 0
+
+        arrays = {name: self._load(name) for name in ARRAY_FILES}
+        arrays = {
+            name: None if array is None else array[keep]
+            for name, array in arrays.items()
+        }
+        records = [r for r, kept in zip(self.records(), keep.tolist()) if kept]
+        _save(self.persist_directory, arrays, records, append=False)
+        return removed
+
+    def footprint(self) -> int:
+        """Bytes a search touches: the compact matrix plus per-row arrays."""
+        return sum(
+            array.nbytes
+            for array in (self.vectors, self.scales, self.tenants)
+            if array is not None
+        )
+
+    def preload(self) -> int:
+        for start in range(0, self.count(), SCORE_BLOCK_ROWS):
+            self.vectors[start : start + SCORE_BLOCK_ROWS].max()
+        self._documents([])
+        return self.footprint()
+
+    def count(self, tenant: int | None = None) -> int:
+        if tenant is None:
+            return self.vectors.shape[0]
+        return len(self.tenant_rows(tenant))
+
+    def tenant_rows(self, tenant: int) -> np.ndarray:
+        tenant = int(tenant)
+        if tenant not in self._tenant_rows:
+            if self.tenants is None:
+                rows = np.empty(0, dtype=np.int64)
+            else:
+                rows = np.flatnonzero(self.tenants == tenant)
+            self._tenant_rows[tenant] = rows
+        return self._tenant_rows[tenant]
+
+    def _documents(self, rows: list[int]) -> list[Document]:
+        if self._offsets is None:
+            offsets = []
+            position = 0
+            with open(self._path(DOCUMENTS_FILE), "rb") as f:
+                for line in f:
+                    offsets.append(position)
+                    position += len(line)
+            self._offsets = offsets
+
+        documents = []
+        with open(self._path(DOCUMENTS_FILE), "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                data = json.loads(f.readline())
+                documents.append(Document(**data))
+        return documents
+
+    def _score(self, query: np.ndarray, rows: np.ndarray | None) -> np.ndarray:
+        count = self.count() if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            if rows is None:
+                block = self.vectors[start : start + SCORE_BLOCK_ROWS]
+            else:
+                block = self.vectors[rows[start : start + SCORE_BLOCK_ROWS]]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def search_by_vector(self, query: np.ndarray, k: int = 4, tenant=None):
+        query = normalize(np.asarray(query, dtype=np.float32))
+        rows = None if tenant is None else self.tenant_rows(tenant)
+        count = self.count() if rows is None else len(rows)
+        if not count:
+            return [], np.empty(0, dtype=np.float32)
+
+        projected = query
+        if self.dimensions < len(query):
+            projected = normalize(query[: self.dimensions])
+        scores = self._score(projected, rows)
+
+        candidates = k
+        if self.rescore is not None:
+            candidates = k * VECTOR_RESCORE_FACTOR
+        candidates = min(candidates, count)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+
+        if self.rescore is not None:
+            top.sort()
+            ids = top if rows is None else rows[top]
+            scores = self.rescore[ids].astype(np.float32) @ query
+            k = min(k, candidates)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return ids[best].tolist(), scores[best]
+
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return ids.tolist(), scores[top]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None
+    ):
+        tenant = filter.get("client_id") if filter else None
+        rows, scores = self.search_by_vector(embedding, k, tenant)
+        return list(
+            zip(self._documents(rows), [relevance_score(s) for s in scores.tolist()])
+        )
+
+    def similarity_search_with_relevance_scores(
+        self, query: str, k: int = 4, filter: dict | None = None
+    ):
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self.embedding_function.embed_query(query), k, filter
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: dict | None = None
+    ) -> list[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_relevance_scores(query, k, filter)
+        ]
+
+
+def _save(persist_directory: str, arrays: dict, records, append: bool):
+    for name, array in arrays.items():
+        if array is not None:
+            np.save(os.path.join(persist_directory, f"{name}.tmp.npy"), array)
+
+    documents_path = os.path.join(persist_directory, DOCUMENTS_FILE)
+    if records is not None and append:
+        with open(documents_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    elif records is not None:
+        with open(f"{documents_path}.tmp", "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(f"{documents_path}.tmp", documents_path)
+
+    # a matriz principal é trocada por último: é ela que marca o índice
+    for name in ARRAY_FILES:
+        path = os.path.join(persist_directory, name)
+        if arrays[name] is not None:
+            os.replace(f"{path}.tmp.npy", path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def quantize(
+    vectors: np.ndarray, dtype: str = "float32", dimensions: int = 0
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """Devolve (matriz compacta, escala por linha ou None)."""
+    if dtype not in COMPACT_DTYPES:
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+    if dimensions and dimensions < vectors.shape[1]:
+        vectors = normalize(vectors[:, :dimensions])
+
+    if dtype != "int8":
+        return vectors.astype(dtype), None
+
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def relevance_score(cosine: float) -> float:
+    """
+    Same scale Chroma's default "l2" store reports for unit vectors: its
+    distance is the squared L2 (2 - 2 * cosine), mapped to 1 - d / sqrt(2).
+    """
+    distance = max(0.0, 2.0 - 2.0 * cosine)
+    return 1.0 - distance / math.sqrt(2)
@@ -0,0 +1,284 @@
+"""
+Convert existing knowledge bases to the compact NumPy storage.
+
+    python -m app.utils.vector_migrate --dtype int8 --dimensions 768
+    python -m app.utils.vector_migrate --client-id 42 --dtype float16
+    python -m app.utils.vector_migrate --drop-chroma   # remove converted Chroma files
+    python -m app.utils.vector_migrate --to-shared --provider gemini --drop-source
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import uuid
+
+import numpy as np
+
+from app.core.config import (
+    VECTOR_BACKEND,
+    VECTOR_DIMENSIONS,
+    VECTOR_DTYPE,
+    VECTOR_RESCORE,
+)
+from app.utils.knowledge_base import (
+    EMBEDDING_PROVIDERS,
+    SHARED_DIR,
+    VECTOR_DIR,
+    shard_dir,
+    store_lock,
+)
+from app.utils.vector_index import (
+    COMPACT_DTYPES,
+    RESCORE_FILE,
+    SCALES_FILE,
+    TENANTS_FILE,
+    VECTORS_FILE,
+    NumpyVectorStore,
+)
+
+CHROMA_FILE = "chroma.sqlite3"
+CHROMA_ADD_BATCH = 1000
+
+
+def _size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def _index_size(persist_dir: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(persist_dir, name))
+        for name in (VECTORS_FILE, SCALES_FILE)
+        if os.path.exists(os.path.join(persist_dir, name))
+    )
+
+
+def _chroma_contents(persist_dir: str):
+    from langchain_chroma.vectorstores import Chroma
+
+    data = Chroma(persist_directory=persist_dir).get(
+        include=["embeddings", "documents", "metadatas"]
+    )
+    records = [
+        {"page_content": text, "metadata": metadata or {}}
+        for text, metadata in zip(data["documents"], data["metadatas"])
+    ]
+    return np.asarray(data["embeddings"], dtype=np.float32), records
+
+
+def _tenants(records: list[dict]) -> np.ndarray | None:
+    tenants = [record["metadata"].get("client_id") for record in records]
+    if not tenants or None in tenants:
+        return None
+    return np.asarray(tenants, dtype=np.int64)
+
+
+def _drop_chroma(persist_dir: str):
+    numpy_files = {VECTORS_FILE, SCALES_FILE, RESCORE_FILE, TENANTS_FILE}
+    with os.scandir(persist_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            elif entry.name == CHROMA_FILE or entry.name.startswith(CHROMA_FILE):
+                os.remove(entry.path)
+            elif entry.name.endswith(".npy") and entry.name not in numpy_files:
+                os.remove(entry.path)
+
+
+def migrate_store(
+    persist_dir: str,
+    dtype: str,
+    dimensions: int = 0,
+    rescore: bool = VECTOR_RESCORE,
+    drop_chroma: bool = False,
+) -> dict | None:
+    disk_before = _size(persist_dir)
+
+    if NumpyVectorStore.exists(persist_dir):
+        store = NumpyVectorStore(persist_dir, None)
+        source = f"numpy {store.dtype}x{store.dimensions}"
+        vectors, records, tenants = store.full_vectors(), None, store.tenants
+    else:
+        source = "chroma"
+        vectors, records = _chroma_contents(persist_dir)
+        tenants = _tenants(records)
+
+    if not len(vectors):
+        return None
+
+    with store_lock(persist_dir):
+        NumpyVectorStore.write(
+            persist_dir,
+            vectors,
+            records,
+            dtype,
+            dimensions,
+            rescore,
+            tenants,
+            append=False,
+        )
+    if drop_chroma and source == "chroma":
+        _drop_chroma(persist_dir)
+
+    store = NumpyVectorStore(persist_dir, None)
+    return {
+        "source": source,
+        "target": f"numpy {store.dtype}x{store.dimensions}",
+        "rows": store.count(),
+        "rescore": store.rescore is not None,
+        "index_bytes": _index_size(persist_dir),
+        "disk_before": disk_before,
+        "disk_after": _size(persist_dir),
+    }
+
+
+def move_to_shared(
+    client_id: str,
+    provider: str,
+    dtype: str,
+    dimensions: int = 0,
+    rescore: bool = VECTOR_RESCORE,
+    drop_source: bool = False,
+) -> dict | None:
+    """Copia a base de um cliente para o shard dele do provedor `provider`."""
+    source_dir = os.path.join(VECTOR_DIR, client_id)
+    if NumpyVectorStore.exists(source_dir):
+        store = NumpyVectorStore(source_dir, None)
+        vectors, records = store.full_vectors(), store.records()
+    else:
+        vectors, records = _chroma_contents(source_dir)
+
+    if not len(vectors):
+        return None
+
+    tenant = int(client_id)
+    for record in records:
+        record["metadata"]["client_id"] = tenant
+
+    target_dir = shard_dir(client_id, provider)
+    with store_lock(target_dir):
+        if VECTOR_BACKEND == "numpy" or NumpyVectorStore.exists(target_dir):
+            if NumpyVectorStore.exists(target_dir):
+                NumpyVectorStore(target_dir, None).delete_tenant(tenant)
+            NumpyVectorStore.write(
+                target_dir,
+                vectors,
+                records,
+                dtype,
+                dimensions,
+                rescore,
+                np.full(len(records), tenant, dtype=np.int64),
+            )
+        else:
+            from langchain_chroma.vectorstores import Chroma
+
+            collection = Chroma(persist_directory=target_dir)._collection
+            collection.delete(where={"client_id": tenant})
+            for start in range(0, len(records), CHROMA_ADD_BATCH):
+                batch = records[start : start + CHROMA_ADD_BATCH]
+                collection.add(
+                    ids=[str(uuid.uuid4()) for _ in batch],
+                    embeddings=vectors[start : start + CHROMA_ADD_BATCH].tolist(),
+                    documents=[record["page_content"] for record in batch],
+                    metadatas=[record["metadata"] for record in batch],
+                )
+
+    if drop_source:
+        shutil.rmtree(source_dir)
+    return {"rows": len(records), "shard": target_dir}
+
+
+def _store_dirs(client_ids: list[str] | None, include_shards: bool):
+    if client_ids is None:
+        client_ids = sorted(name for name in os.listdir(VECTOR_DIR) if name.isdigit())
+    for client_id in client_ids:
+        persist_dir = os.path.join(VECTOR_DIR, client_id)
+        if os.path.isdir(persist_dir):
+            yield f"client {client_id}", client_id, persist_dir
+
+    if not include_shards:
+        return
+    for provider in EMBEDDING_PROVIDERS:
+        provider_dir = os.path.join(SHARED_DIR, provider)
+        if not os.path.isdir(provider_dir):
+            continue
+        for name in sorted(os.listdir(provider_dir)):
+            persist_dir = os.path.join(provider_dir, name)
+            if os.path.isdir(persist_dir):
+                yield f"shard {provider}/{name}", None, persist_dir
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--client-id", action="append", dest="client_ids")
+    parser.add_argument("--dtype", choices=COMPACT_DTYPES, default=VECTOR_DTYPE)
+    parser.add_argument("--dimensions", type=int, default=VECTOR_DIMENSIONS)
+    parser.add_argument(
+        "--rescore", action=argparse.BooleanOptionalAction, default=VECTOR_RESCORE
+    )
+    parser.add_argument("--drop-chroma", action="store_true")
+    parser.add_argument(
+        "--to-shared",
+        action="store_true",
+        help="move per-client stores into the shared shards (VECTOR_LAYOUT=shared)",
+    )
+    parser.add_argument(
+        "--provider",
+        choices=EMBEDDING_PROVIDERS,
+        help="embeddings provider the stores were built with (with --to-shared)",
+    )
+    parser.add_argument("--drop-source", action="store_true")
+    args = parser.parse_args(argv)
+    if args.to_shared and not args.provider:
+        parser.error("--to-shared requires --provider")
+
+    if not os.path.isdir(VECTOR_DIR):
+        print(f"No knowledge bases under {VECTOR_DIR}")
+        return 0
+
+    failed = 0
+    stores = _store_dirs(args.client_ids, not args.client_ids and not args.to_shared)
+    for label, client_id, persist_dir in list(stores):
+        try:
+            if args.to_shared:
+                result = move_to_shared(
+                    client_id,
+                    args.provider,
+                    args.dtype,
+                    args.dimensions,
+                    rescore=args.rescore,
+                    drop_source=args.drop_source,
+                )
+            else:
+                result = migrate_store(
+                    persist_dir,
+                    args.dtype,
+                    args.dimensions,
+                    rescore=args.rescore,
+                    drop_chroma=args.drop_chroma,
+                )
+        except Exception as e:
+            failed += 1
+            print(f"{label}: failed: {e}")
+            continue
+
+        if result is None:
+            print(f"{label}: empty, skipped")
+        elif args.to_shared:
+            print(f"{label}: {result['rows']} rows -> {result['shard']}")
+        else:
+            print(
+                f"{label}: {result['source']} -> {result['target']}, "
+                f"{result['rows']} rows, "
+                f"index {result['index_bytes'] / 1e6:.1f} MB, "
+                f"disk {result['disk_before'] / 1e6:.1f} -> "
+                f"{result['disk_after'] / 1e6:.1f} MB"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Micro-benchmarks for the billing, PIX and ingestion primitives.
+
+    python -m benchmarks.bench                   # run and print results
+    python -m benchmarks.bench --save            # store results as the baseline
+    python -m benchmarks.bench --check           # fail if slower than baseline
+    python -m benchmarks.bench --sizes 10000 10000000 --only calc_billing
+
+Run from the repository root (templates and the database dir are relative).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+os.environ.setdefault("CHAVE_PIX", "bench@example.com")
+os.environ.setdefault("CIDADE_PIX", "SAO PAULO")
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_THRESHOLD = 1.25
+SEED = 42
+
+CASES = {}
+
+
+def bench(name):
+    def decorator(func):
+        CASES[name] = func
+        return func
+
+    return decorator
+
+
+def measure(func, repeat: int = 5, number: int = 1) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def sample_text(words: int) -> str:
+    rng = random.Random(SEED)
+    vocabulary = [
+        "fatura",
+        "cliente",
+        "pagamento",
+        "modelo",
+        "token",
+        "requisição",
+        "conhecimento",
+        "documento",
+        "valor",
+        "api",
+    ]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+@bench("calculate_openai_cost")
+def bench_openai_cost(args):
+    from app.utils.calculators import calculate_openai_cost
+
+    def run():
+        for i in range(1000):
+            calculate_openai_cost(0.0015, 0.002, 1200 + i, 300 + i)
+
+    return {"x1000": measure(run, number=10)}
+
+
+@bench("calculate_gemini_cost")
+def bench_gemini_cost(args):
+    from app.utils.calculators import calculate_gemini_cost
+
+    def run():
+        for i in range(1000):
+            calculate_gemini_cost(0.35, 1.05, 1200 + i, 300 + i)
+
+    return {"x1000": measure(run, number=10)}
+
+
+@bench("count_tokens")
+def bench_count_tokens(args):
+    from app.utils.calculators import count_tokens
+
+    text = sample_text(2000)
+    return {
+        model: measure(lambda: count_tokens(text, model), number=20)
+        for model in ("gpt-4o-mini", "gemini-2.0-flash")
+    }
+
+
+@bench("crc16")
+def bench_crc16(args):
+    from app.utils.generators import crc16
+
+    data = sample_text(40).encode("utf-8")
+    return {f"{len(data)}b": measure(lambda: crc16(data), number=200)}
+
+
+@bench("generate_payload_pix")
+def bench_payload_pix(args):
+    from app.utils.generators import clear_pix_cache, generate_payload_pix
+
+    def cold():
+        clear_pix_cache()
+        generate_payload_pix(Decimal("123.45"), "Cliente", "API")
+
+    return {
+        "cold": measure(cold, number=200),
+        "cached": measure(
+            lambda: generate_payload_pix(Decimal("123.45"), "Cliente", "API"),
+            number=200,
+        ),
+    }
+
+
+@bench("generate_qrcode_pix")
+def bench_qrcode_pix(args):
+    from app.utils.generators import clear_pix_cache, generate_qrcode_pix
+
+    def cold():
+        clear_pix_cache()
+        generate_qrcode_pix(1, "Cliente", Decimal("123.45"), "API")
+
+    return {
+        "png": measure(cold, number=5),
+        "cached": measure(
+            lambda: generate_qrcode_pix(1, "Cliente", Decimal("123.45"), "API"),
+            number=200,
+        ),
+    }
+
+
+@bench("splitter_chunks")
+def bench_splitter_chunks(args):
+    from langchain.schema import Document
+    from app.utils.knowledge_base import splitter_chunks
+
+    documents = [Document(page_content=sample_text(20_000)) for _ in range(5)]
+    return {
+        f"5x20k_words_{model}": measure(
+            lambda: splitter_chunks(documents, model), repeat=3
+        )
+        for model in ("gpt-4o-mini", "gemini-2.0-flash")
+    }
+
+
+@bench("vector_search")
+def bench_vector_search(args):
+    import tempfile
+    import numpy as np
+    from app.utils.vector_index import NumpyVectorStore
+
+    rng = np.random.default_rng(SEED)
+    vectors = rng.normal(size=(20_000, 768)).astype(np.float32)
+    query = vectors[0] + rng.normal(size=768).astype(np.float32)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype, dimensions in (("float32", 0), ("int8", 0), ("int8", 256)):
+            path = os.path.join(tmp, f"{dtype}_{dimensions}")
+            NumpyVectorStore.write(path, vectors, [], dtype, dimensions)
+            store = NumpyVectorStore(path, None)
+            results[f"20k_{dtype}x{store.dimensions}"] = measure(
+                lambda: store.search_by_vector(query, 6), number=5
+            )
+    return results
+
+
+@bench("generate_receipt_pdf")
+def bench_receipt_pdf(args):
+    from datetime import date
+    from app.core.config import COMPANY_NAME
+    from app.services.mail.utils.renders import render_client_receipt_html
+    from app.utils.generators import generate_receipt_pdf
+
+    client = {"name": "Cliente", "email": "cliente@example.com"}
+    billing = {"amount_due": Decimal("123.45"), "paid_at": date.today(), "id": 1}
+    context = {
+        "client": client,
+        "billing": billing,
+        "issue_date": date.today(),
+        "company_name": COMPANY_NAME,
+    }
+    html_template = render_client_receipt_html(
+        client, billing, date.today(), COMPANY_NAME
+    )
+
+    return {
+        "pdf": measure(
+            lambda: generate_receipt_pdf(html_template, context, "recibo.pdf"),
+            repeat=3,
+        )
+    }
+
+
+async def _calc_billing_timings(sizes: list[int]) -> dict:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db.base import Base
+    from app.db.model import ai_model, client, log, payment  # noqa: F401
+    from app.db.model.client import Client
+    from app.db.model.log import RequestLog, UploadLog
+    from app.utils.calculators import calc_billing
+
+    results = {}
+    for size in sizes:
+        engine = create_async_engine("sqlite+aiosqlite://", future=True)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(
+                Client.__table__.insert(),
+                [{"name": "bench", "email": "bench@example.com", "monthly_limit": 0}],
+            )
+
+            rng = random.Random(SEED)
+            batch = 50_000
+            for offset in range(0, size, batch):
+                await conn.execute(
+                    RequestLog.__table__.insert(),
+                    [
+                        {
+                            "client_id": 1,
+                            "endpoint": "chat/completions",
+                            "input_tokens": 1200,
+                            "output_tokens": 300,
+                            "total_token_used": 1500,
+                            "model_used": "gemini-2.0-flash",
+                            "cost": Decimal(rng.randint(1, 9999)) / 1_000_000,
+                        }
+                        for _ in range(min(batch, size - offset))
+                    ],
+                )
+            await conn.execute(
+                UploadLog.__table__.insert(),
+                [
+                    {
+                        "client_id": 1,
+                        "upload_cost": Decimal("0.01"),
+                        "embedding_tokens": 1000,
+                        "model_used": "gemini-embedding-001",
+                    }
+                    for _ in range(max(1, size // 1000))
+                ],
+            )
+
+        session_factory = sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        timings = []
+        for _ in range(3):
+            async with session_factory() as session:
+                start = time.perf_counter()
+                await calc_billing(1, session)
+                timings.append(time.perf_counter() - start)
+
+        await engine.dispose()
+        results[f"{size}_rows"] = {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "repeat": 3,
+            "number": 1,
+        }
+
+    return results
+
+
+@bench("calc_billing")
+def bench_calc_billing(args):
+    return asyncio.run(_calc_billing_timings(args.sizes))
+
+
+def run_cases(args) -> dict:
+    results = {}
+    for name, func in CASES.items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            results[name] = func(args)
+        except (ImportError, OSError) as e:
+            print(f"{name:<24} skipped ({e})")
+            continue
+
+        for variant, timing in results[name].items():
+            print(
+                f"{name:<24} {variant:<20} "
+                f"min {timing['min'] * 1000:10.3f} ms   "
+                f"median {timing['median'] * 1000:10.3f} ms"
+            )
+
+    return results
+
+
+def load_baseline() -> dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict):
+    baseline = load_baseline()
+    baseline.setdefault("results", {})
+    for name, variants in results.items():
+        baseline["results"].setdefault(name, {}).update(variants)
+    baseline["machine"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    print(f"Baseline saved to {BASELINE_PATH}")
+
+
+def check_regressions(results: dict, threshold: float) -> list[str]:
+    baseline = load_baseline().get("results", {})
+    regressions = []
+    for name, variants in results.items():
+        for variant, timing in variants.items():
+            reference = baseline.get(name, {}).get(variant)
+            if not reference:
+                continue
+            ratio = timing["min"] / reference["min"]
+            if ratio > threshold:
+                regressions.append(
+                    f"{name} [{variant}]: {ratio:.2f}x slower than baseline "
+                    f"({reference['min'] * 1000:.3f} ms -> {timing['min'] * 1000:.3f} ms)"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="*", choices=sorted(CASES))
+    parser.add_argument("--sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_cases(args)
+
+    if args.save:
+        save_baseline(results)
+
+    if args.check:
+        regressions = check_regressions(results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.2f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
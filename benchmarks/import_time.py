@@ -0,0 +1,66 @@
+"""
+Per-module import cost of the application, parsed from ``python -X importtime``.
+
+    python -m benchmarks.import_time                 # import app.main
+    python -m benchmarks.import_time app.utils.text_response --top 40
+    python -m benchmarks.import_time --packages      # totals per top-level package
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def measure_imports(module: str) -> list[tuple[str, int, int]]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise SystemExit(result.returncode)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--packages", action="store_true")
+    args = parser.parse_args(argv)
+
+    imports = measure_imports(args.module)
+    total_us = sum(self_us for _, self_us, _ in imports)
+
+    if args.packages:
+        packages = defaultdict(int)
+        for name, self_us, _ in imports:
+            packages[name.strip().split(".")[0]] += self_us
+        rows = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        print(f"{'self ms':>10}  package")
+        for name, self_us in rows[: args.top]:
+            print(f"{self_us / 1000:10.1f}  {name}")
+    else:
+        rows = sorted(imports, key=lambda item: item[2], reverse=True)
+        print(f"{'self ms':>10} {'cumul ms':>10}  module")
+        for name, self_us, cumulative_us in rows[: args.top]:
+            print(f"{self_us / 1000:10.1f} {cumulative_us / 1000:10.1f}  {name}")
+
+    print(f"\nimport {args.module}: {total_us / 1000:.1f} ms, {len(imports)} modules")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
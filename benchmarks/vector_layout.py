@@ -0,0 +1,156 @@
+"""
+Per-client vs shared (sharded, tenant-filtered) knowledge base layout.
+
+    python -m benchmarks.vector_layout
+    python -m benchmarks.vector_layout --tenants 10 1000 10000 --rows 20 --dim 256
+
+Each case builds NumPy stores for N tenants in a temporary directory, then
+answers random-tenant queries through an LRU of VECTOR_STORE_CACHE_SIZE open
+stores (as get_client_db does) and reports latency, open files and memory.
+Each case runs in a fresh process so memory numbers do not leak across cases.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from app.core.config import VECTOR_SHARDS, VECTOR_STORE_CACHE_SIZE
+
+SEED = 42
+
+
+def _memory_mb() -> tuple[float, float]:
+    """(anonymous, file-backed) resident memory; mmapped index pages count as file."""
+    with open("/proc/self/statm") as f:
+        resident, shared = (int(value) for value in f.read().split()[1:3])
+    page = os.sysconf("SC_PAGE_SIZE") / 1e6
+    return (resident - shared) * page, shared * page
+
+
+def _open_files() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def _disk(path: str) -> tuple[int, int]:
+    files = size = 0
+    for root, _, names in os.walk(path):
+        files += len(names)
+        size += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return files, size
+
+
+def run_case(layout: str, tenants: int, rows: int, dim: int, queries: int) -> dict:
+    import numpy as np
+    from app.utils.vector_index import NumpyVectorStore
+
+    rng = np.random.default_rng(SEED)
+    shards = min(VECTOR_SHARDS, tenants)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        if layout == "per_client":
+            for tenant in range(tenants):
+                NumpyVectorStore.write(
+                    os.path.join(tmp, str(tenant)),
+                    rng.normal(size=(rows, dim)).astype(np.float32),
+                    [
+                        {"page_content": f"{tenant}-{i}", "metadata": {}}
+                        for i in range(rows)
+                    ],
+                )
+        else:
+            for shard in range(shards):
+                members = list(range(shard, tenants, shards))
+                NumpyVectorStore.write(
+                    os.path.join(tmp, f"{shard:03d}"),
+                    rng.normal(size=(rows * len(members), dim)).astype(np.float32),
+                    [
+                        {"page_content": f"{tenant}-{i}", "metadata": {}}
+                        for tenant in members
+                        for i in range(rows)
+                    ],
+                    tenants=np.repeat(np.asarray(members, dtype=np.int64), rows),
+                )
+        build = time.perf_counter() - started
+        files, size = _disk(tmp)
+
+        cache = OrderedDict()
+        anon_before, mapped_before = _memory_mb()
+        picker = random.Random(SEED)
+        timings = []
+        for _ in range(queries):
+            tenant = picker.randrange(tenants)
+            query = rng.normal(size=dim).astype(np.float32)
+            started = time.perf_counter()
+
+            if layout == "per_client":
+                key, filter_tenant = str(tenant), None
+            else:
+                key, filter_tenant = f"{tenant % shards:03d}", tenant
+            store = cache.get(key)
+            if store is None:
+                store = NumpyVectorStore(os.path.join(tmp, key), None)
+                cache[key] = store
+                while len(cache) > VECTOR_STORE_CACHE_SIZE:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(key)
+
+            ids, _ = store.search_by_vector(query, 6, filter_tenant)
+            store._documents(ids)
+            timings.append(time.perf_counter() - started)
+
+        timings.sort()
+        anon, mapped = _memory_mb()
+        return {
+            "layout": layout,
+            "tenants": tenants,
+            "stores": tenants if layout == "per_client" else shards,
+            "files": files,
+            "disk_mb": size / 1e6,
+            "build_s": build,
+            "p50_ms": statistics.median(timings) * 1000,
+            "p95_ms": timings[int(len(timings) * 0.95)] * 1000,
+            "open_files": _open_files(),
+            "anon_mb": anon - anon_before,
+            "mapped_mb": mapped - mapped_before,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'layout':<11}{'tenants':>8}{'stores':>8}{'files':>8}{'disk MB':>9}"
+        f"{'build s':>9}{'p50 ms':>8}{'p95 ms':>8}{'fds':>6}{'anon MB':>9}"
+        f"{'mapped MB':>11}"
+    )
+    for tenants in args.tenants:
+        for layout in ("per_client", "shared"):
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                r = pool.submit(
+                    run_case, layout, tenants, args.rows, args.dim, args.queries
+                ).result()
+            print(
+                f"{r['layout']:<11}{r['tenants']:>8}{r['stores']:>8}{r['files']:>8}"
+                f"{r['disk_mb']:>9.1f}{r['build_s']:>9.2f}{r['p50_ms']:>8.3f}"
+                f"{r['p95_ms']:>8.3f}{r['open_files']:>6}{r['anon_mb']:>9.1f}"
+                f"{r['mapped_mb']:>11.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy import select, update
+
+
+def test_rollups_rebuild_with_archived_legacy_upload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "database").mkdir()
+
+    import app.main  # noqa: F401  registra todos os modelos
+    from app.db.base import async_session, engine, init_models
+    from app.db.model.client import Client
+    from app.db.model.log import UploadLog
+    from app.db.model.payment import Billing
+    from app.db.model.usage import UsageRollup
+    from app.services.archive import archive_billing
+    from app.services.usage import rebuild_usage_rollups
+
+    async def run():
+        await init_models()
+        async with async_session() as session:
+            client = Client("legacy", "legacy@example.com", 100)
+            session.add(client)
+            await session.flush()
+            log = UploadLog(client.id, 0.25, 10, "gemini-2.0-flash")
+            session.add(log)
+            await session.flush()
+            # upload gravado antes de client_upload_logs.created_at existir
+            await session.execute(
+                update(UploadLog).where(UploadLog.id == log.id).values(created_at=None)
+            )
+            billing = Billing(client.id)
+            billing.status = True
+            billing.first_upload_log_id = billing.last_upload_log_id = log.id
+            session.add(billing)
+            await session.commit()
+            billing_id = billing.id
+
+        assert await archive_billing(billing_id) == {"uploads": 1}
+        await rebuild_usage_rollups()
+
+        async with async_session() as session:
+            rollups = (await session.execute(select(UsageRollup))).scalars().all()
+        await engine.dispose()
+        return rollups
+
+    rollups = asyncio.run(run())
+    assert {rollup.period for rollup in rollups} == {"hour", "day"}
+    assert all(rollup.embedding_tokens == 10 for rollup in rollups)
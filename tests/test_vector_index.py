@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.utils.vector_index import normalize, relevance_score
+
+
+def test_relevance_score_matches_chroma_l2():
+    chroma = pytest.importorskip("langchain_chroma")
+
+    rng = np.random.default_rng(0)
+    query = normalize(rng.normal(size=8))
+    vectors = normalize(rng.normal(size=(20, 8)))
+    vectors[0] = query
+
+    db = chroma.Chroma(collection_name="relevance_parity")
+    db._collection.add(
+        ids=[str(i) for i in range(len(vectors))],
+        embeddings=vectors.tolist(),
+        documents=[str(i) for i in range(len(vectors))],
+    )
+    to_relevance = db._select_relevance_score_fn()
+
+    results = db.similarity_search_by_vector_with_relevance_scores(
+        query.tolist(), k=len(vectors)
+    )
+    for doc, distance in results:
+        cosine = float(vectors[int(doc.page_content)] @ query)
+        expected = to_relevance(distance)
+        assert relevance_score(cosine) == pytest.approx(expected, abs=1e-4)
+
+
+def test_relevance_score_known_values():
+    assert relevance_score(1.0) == pytest.approx(1.0)
+    assert relevance_score(0.8) == pytest.approx(0.717, abs=1e-3)
+    assert relevance_score(0.6) == pytest.approx(0.434, abs=1e-3)